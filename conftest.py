@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(settings):
+    """Как core.test_runner: миниатюры режутся на месте, без пула."""
+    settings.THUMBNAIL_WORKERS = 0
@@ -1,5 +1,7 @@
 from django.urls import path
 
+from core.decorators import cache_anonymous
+
 from . import views
 
 
@@ -7,9 +9,9 @@ app_name = 'about'
 
 urlpatterns = [
     path('author/',
-         views.AboutAuthorView.as_view(),
+         cache_anonymous()(views.AboutAuthorView.as_view()),
          name='author'),
     path('tech/',
-         views.AboutTechView.as_view(),
+         cache_anonymous()(views.AboutTechView.as_view()),
          name='tech'),
 ]
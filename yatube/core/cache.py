@@ -0,0 +1,13 @@
+"""Бэкенды кэша с замерами для Server-Timing (см. core.timing).
+
+Метрики кэша собирает только бэкенд с TimingCacheMixin. Чтобы сменить
+бэкенд в CACHES и не потерять их, обёртка пишется так же, например
+class TimedRedisCache(TimingCacheMixin, RedisCache).
+"""
+from django.core.cache.backends.locmem import LocMemCache
+
+from .timing import TimingCacheMixin
+
+
+class TimedLocMemCache(TimingCacheMixin, LocMemCache):
+    pass
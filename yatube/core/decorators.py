@@ -0,0 +1,58 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+# Параметры, от которых зависит содержимое кэшируемых страниц.
+PAGE_PARAMS = ('page', 'before', 'after')
+
+
+def page_cache_key(request, version):
+    params = '&'.join(
+        f'{name}={request.GET[name]}'
+        for name in PAGE_PARAMS if name in request.GET)
+    digest = hashlib.md5(
+        f'{request.path}?{params}'.encode()).hexdigest()
+    return f'page:{digest}:{version}'
+
+
+def cache_anonymous(version=None):
+    """Кэширует страницу целиком для анонимных посетителей.
+
+    version(request, **kwargs) возвращает строку поколений данных страницы
+    (см. posts.generations): сигналы сдвигают поколение, и старая копия
+    больше не находится. Запросы с посторонними GET-параметрами не
+    кэшируются — ссылки постранички повторяют их в разметке.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            cacheable = (
+                request.method in ('GET', 'HEAD')
+                and not request.user.is_authenticated
+                and set(request.GET) <= set(PAGE_PARAMS)
+            )
+            if not cacheable:
+                response = view(request, *args, **kwargs)
+                patch_vary_headers(response, ('Cookie',))
+                if request.user.is_authenticated:
+                    patch_cache_control(response, private=True)
+                return response
+            key = page_cache_key(
+                request, version(request, **kwargs) if version else '')
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+                patch_vary_headers(response, ('Cookie',))
+                if response.status_code == 200 and not response.cookies:
+                    patch_cache_control(
+                        response, public=True,
+                        max_age=settings.PAGE_CACHE_MAX_AGE)
+                    cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
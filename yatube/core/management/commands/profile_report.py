@@ -0,0 +1,46 @@
+import glob
+import io
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+
+class Command(BaseCommand):
+    help = ('Сводит профили ProfilingMiddleware по представлениям и '
+            'выводит самые горячие функции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('views', nargs='*',
+                            help='Представления, например posts:index; '
+                                 'по умолчанию все.')
+        parser.add_argument('--dir', default=settings.PROFILE_DIR)
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--sort', choices=SORT_KEYS,
+                            default='cumulative')
+
+    def handle(self, *args, **options):
+        directory = options['dir']
+        names = [view.replace(':', '.') for view in options['views']] or (
+            sorted(os.listdir(directory)) if os.path.isdir(directory)
+            else [])
+        if not names:
+            raise CommandError(f'В {directory} нет профилей.')
+        for name in names:
+            files = sorted(glob.glob(
+                os.path.join(directory, name, '*.pstats')))
+            if not files:
+                self.stdout.write(f'{name}: профилей нет')
+                continue
+            self.stdout.write(
+                f'== {name.replace(".", ":")}: запросов {len(files)}')
+            # pstats пишет строку по частям, а OutputWrapper завершает
+            # переводом строки каждую запись: собираем отчёт целиком.
+            report = io.StringIO()
+            stats = pstats.Stats(*files, stream=report)
+            stats.strip_dirs().sort_stats(options['sort']).print_stats(
+                options['top'])
+            self.stdout.write(report.getvalue())
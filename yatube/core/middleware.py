@@ -0,0 +1,151 @@
+import cProfile
+import hmac
+import logging
+import os
+import random
+import uuid
+from contextlib import ExitStack
+from time import perf_counter, strftime
+
+from django.conf import settings
+from django.db import connections
+
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """Сводка по запросу в заголовке Server-Timing и строке лога.
+
+    SQL (число и время), рендеринг шаблонов, кэш (время, попадания и
+    промахи) и нарезка миниатюр. Замер — пара perf_counter на операцию,
+    поэтому middleware можно держать включённой. Тело потоковых ответов
+    читается уже после middleware и в сводку не попадает.
+
+    Строка лога пишется всегда. Заголовок раскрывает устройство сайта и
+    уходит только сотрудникам (is_staff) или всем при SERVER_TIMING_HEADER.
+    Попадания и промахи кэша видны, только если бэкенд кэша подмешивает
+    core.timing.TimingCacheMixin (см. core.cache).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings, token = timing.start()
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        total = perf_counter() - started
+        summary = self.summary(request, response, timings, total)
+        if self.should_send_header(request):
+            response['Server-Timing'] = self.header(summary)
+        logger.info(
+            'view=%(view)s method=%(method)s status=%(status)s '
+            'total_ms=%(total_ms).1f db_queries=%(db_queries)d '
+            'db_ms=%(db_ms).1f template_ms=%(template_ms).1f '
+            'cache_ms=%(cache_ms).1f cache_hits=%(cache_hits)d '
+            'cache_misses=%(cache_misses)d thumbnail_ms=%(thumbnail_ms).1f',
+            summary, extra={'timing': summary})
+        return response
+
+    @staticmethod
+    def should_send_header(request):
+        if settings.SERVER_TIMING_HEADER:
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    @staticmethod
+    def summary(request, response, timings, total):
+        durations, counts = timings.durations, timings.counts
+        match = request.resolver_match
+        return {
+            'view': match.view_name if match else '-',
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': total * 1000,
+            'db_queries': counts['db'],
+            'db_ms': durations['db'] * 1000,
+            'template_ms': durations['template'] * 1000,
+            'cache_ms': durations['cache'] * 1000,
+            'cache_hits': counts['cache_hit'],
+            'cache_misses': counts['cache_miss'],
+            'thumbnail_ms': durations['thumbnail'] * 1000,
+        }
+
+    @staticmethod
+    def header(summary):
+        return ', '.join((
+            'db;dur={:.1f};desc="{} queries"'.format(
+                summary['db_ms'], summary['db_queries']),
+            'tpl;dur={:.1f}'.format(summary['template_ms']),
+            'cache;dur={:.1f};desc="hits={} misses={}"'.format(
+                summary['cache_ms'], summary['cache_hits'],
+                summary['cache_misses']),
+            'thumb;dur={:.1f}'.format(summary['thumbnail_ms']),
+            'total;dur={:.1f}'.format(summary['total_ms']),
+        ))
+
+
+class ProfilingMiddleware:
+    """Профилирует выборку запросов cProfile и пишет .pstats по view.
+
+    Профилируется доля PROFILE_SAMPLE_RATE запросов, а также любой запрос
+    с заголовком PROFILE_TRIGGER_HEADER от сотрудника (is_staff) или со
+    значением, равным PROFILE_TRIGGER_TOKEN. Файлы ложатся в
+    PROFILE_DIR/<view>/, сводку по ним строит команда profile_report.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # В потоке уже работает другой профилировщик.
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        match = request.resolver_match
+        self.save(profiler, match.view_name if match else 'unresolved')
+        return response
+
+    @staticmethod
+    def should_profile(request):
+        trigger = request.META.get(
+            'HTTP_' + settings.PROFILE_TRIGGER_HEADER.upper().replace(
+                '-', '_'))
+        if trigger is not None:
+            token = settings.PROFILE_TRIGGER_TOKEN
+            user = getattr(request, 'user', None)
+            if (token and hmac.compare_digest(trigger, token)) or (
+                    user is not None and user.is_staff):
+                return True
+        rate = settings.PROFILE_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    @staticmethod
+    def save(profiler, view_name):
+        directory = os.path.join(
+            settings.PROFILE_DIR, view_name.replace(':', '.'))
+        os.makedirs(directory, exist_ok=True)
+        name = '{}-{}-{}.pstats'.format(
+            strftime('%Y%m%d%H%M%S'), os.getpid(), uuid.uuid4().hex[:8])
+        try:
+            profiler.dump_stats(os.path.join(directory, name))
+        except OSError:
+            logger.exception('Не удалось сохранить профиль %s', view_name)
@@ -0,0 +1,16 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты режут миниатюры на месте: базу SQLite в памяти поток пула
+    разделить не может, её таблицы блокируются целиком."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.inline_thumbnails = override_settings(THUMBNAIL_WORKERS=0)
+        self.inline_thumbnails.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.inline_thumbnails.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,142 @@
+"""Замеры времени внутри запроса для заголовка Server-Timing.
+
+ServerTimingMiddleware (core.middleware) заводит на запрос объект Timings,
+а код, который стоит измерять, оборачивается в timed(метрика): SQL — через
+connection.execute_wrapper, шаблоны — бэкендом TimedDjangoTemplates,
+кэш — TimingCacheMixin, миниатюры — в posts.thumbnails. Вне запроса
+(фоновые потоки, команды) timed ничего не делает.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.template.backends.django import (DjangoTemplates, Template,
+                                             reraise)
+from django.template.exceptions import TemplateDoesNotExist
+
+_current = ContextVar('timings', default=None)
+
+
+class Timings:
+    """Суммарные длительности (секунды) и число вызовов по метрикам."""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.active = set()
+
+
+def start():
+    """Начинает замеры запроса; вернёт токен для stop()."""
+    timings = Timings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(metric):
+    """Добавляет время блока к метрике текущего запроса.
+
+    Вложенные замеры той же метрики не считаются второй раз: шаблон,
+    подключающий другой шаблон, — это одно время рендеринга. Блок
+    получает True, если замер внешний.
+    """
+    timings = _current.get()
+    if timings is None or metric in timings.active:
+        yield False
+        return
+    timings.active.add(metric)
+    started = perf_counter()
+    try:
+        yield True
+    finally:
+        timings.durations[metric] += perf_counter() - started
+        timings.counts[metric] += 1
+        timings.active.discard(metric)
+
+
+def count(metric, value=1):
+    timings = _current.get()
+    if timings is not None:
+        timings.counts[metric] += value
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Для connection.execute_wrapper: время и число SQL-запросов."""
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+class TimingCacheMixin:
+    """Время обращений к кэшу и число попаданий и промахов.
+
+    Подмешивается к классу бэкенда кэша, см. core.cache.
+    """
+
+    _timing_missing = object()
+
+    def get(self, key, default=None, version=None):
+        with timed('cache') as outer:
+            value = super().get(key, self._timing_missing, version)
+        hit = value is not self._timing_missing
+        if outer:
+            count('cache_hit' if hit else 'cache_miss')
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with timed('cache') as outer:
+            found = super().get_many(keys, version)
+        if outer:
+            count('cache_hit', len(found))
+            count('cache_miss', len(keys) - len(found))
+        return found
+
+    def set(self, *args, **kwargs):
+        with timed('cache'):
+            return super().set(*args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        with timed('cache'):
+            return super().set_many(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        with timed('cache'):
+            return super().add(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        with timed('cache'):
+            return super().incr(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with timed('cache'):
+            return super().delete(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        with timed('cache'):
+            return super().delete_many(*args, **kwargs)
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django со временем рендеринга в Server-Timing."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -1,4 +1,13 @@
+from django.conf import settings
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from posts.storage import HASHED_NAME
+
+# Год — предел max-age по RFC 7234.
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
 
 
 def page_not_found(request, exception):
@@ -17,3 +26,19 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def media(request, path):
+    """Раздача MEDIA_ROOT в разработке.
+
+    Картинки постов названы по содержимому, миниатюры sorl — по имени
+    исходника и параметрам, поэтому по одному адресу всегда один и тот же
+    файл: браузеру можно не перепроверять его.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    immutable = (HASHED_NAME.search(path)
+                 or path.startswith(thumbnail_settings.THUMBNAIL_PREFIX))
+    if immutable and response.status_code == 200:
+        patch_cache_control(response, public=True,
+                            max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return response
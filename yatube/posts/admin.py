@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Group, Post
+from .search import fts_available, matching_ids, to_fts_query
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -11,6 +12,15 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через FTS5 вместо LIKE '%q%' по всей таблице.
+        if not search_term or not fts_available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        if not to_fts_query(search_term):
+            return queryset.none(), False
+        return queryset.filter(pk__in=matching_ids(search_term)), False
+
 
 admin.site.register(Post, PostAdmin)
 
@@ -0,0 +1,150 @@
+"""JSON API только для чтения: ленты, профиль, группа и пост.
+
+Строки берутся из .values() — без моделей и шаблонов, — а ответ пишется
+потоком по одной строке. Параметр fields=id,text,... оставляет в ответе
+только нужные поля, постраничка курсорная, как в HTML-лентах.
+"""
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from . import timeline
+from .conditional import (conditional, follow_state, group_state,
+                          index_state, post_state, profile_state)
+from .models import Comment, Group, Post, User
+from .storage import post_image_storage
+from .utils import FEED_ORDERING, CursorPaginator, query_prefix
+from .views import COMMENT_ORDERING
+
+# Поле ответа -> путь для .values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+
+encode = DjangoJSONEncoder(ensure_ascii=False).encode
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def requested_fields(request, available):
+    """Поля из ?fields=; без параметра — все доступные."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise FieldsError('Неизвестные поля: {}. Доступны: {}.'.format(
+            ', '.join(unknown), ', '.join(available)))
+    return names
+
+
+def project(row, names, available):
+    item = {name: row[available[name]] for name in names}
+    if 'image' in item:
+        item['image'] = (
+            post_image_storage.url(item['image']) if item['image'] else None)
+    return item
+
+
+def stream(items, next_url, **head):
+    """Тело ответа по частям: поля head, results и ссылка next."""
+    yield '{'
+    for key, value in head.items():
+        yield f'{encode(key)}:{encode(value)},'
+    yield '"results":['
+    for position, item in enumerate(items):
+        yield (',' if position else '') + encode(item)
+    yield f'],"next":{encode(next_url)}}}'
+
+
+def json_page(request, queryset, ordering, available, names=None,
+              get_page=None, **head):
+    """Курсорная страница queryset в виде потокового JSON-ответа.
+
+    names — поля строк; по умолчанию берутся из ?fields=. get_page строит
+    страницу из строк .values() вместо CursorPaginator.
+    """
+    if names is None:
+        try:
+            names = requested_fields(request, available)
+        except FieldsError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+    keys = [name.lstrip('-') for name in ordering]
+    paths = {available[name] for name in names}
+    rows = queryset.values(*paths.union(keys))
+    if get_page is None:
+        paginator = CursorPaginator(rows, settings.API_PAGE_SIZE, ordering)
+        page = paginator.get_cursor_page(request.GET)
+    else:
+        page = get_page(rows)
+    next_url = None
+    if page.next_cursor:
+        next_url = '{}?{}{}={}'.format(
+            request.path, query_prefix(request), page.paginator.next_param,
+            page.next_cursor)
+    items = (project(row, names, available) for row in page)
+    return StreamingHttpResponse(
+        stream(items, next_url, **head), content_type='application/json')
+
+
+@conditional(index_state)
+def index(request):
+    return json_page(request, Post.objects.all(), FEED_ORDERING,
+                     POST_FIELDS)
+
+
+@conditional(group_state)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return json_page(request, group.posts.all(), FEED_ORDERING,
+                     POST_FIELDS)
+
+
+@conditional(profile_state)
+def profile(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return json_page(request, author.posts.all(), FEED_ORDERING,
+                     POST_FIELDS)
+
+
+@conditional(follow_state)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация.'}, status=401)
+    return json_page(
+        request, Post.objects.all(), FEED_ORDERING, POST_FIELDS,
+        get_page=lambda rows: timeline.get_page(
+            request.user, request.GET, settings.API_PAGE_SIZE, rows))
+
+
+@conditional(post_state)
+def post_detail(request, post_id):
+    """Пост с полями из ?fields= и курсорная страница его комментариев."""
+    try:
+        names = requested_fields(request, POST_FIELDS)
+    except FieldsError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    row = get_object_or_404(
+        Post.objects.values(*{POST_FIELDS[name] for name in names}),
+        pk=post_id)
+    comments = Comment.objects.filter(post_id=post_id)
+    # fields относится к посту, у комментариев всегда полный набор полей.
+    return json_page(request, comments, COMMENT_ORDERING, COMMENT_FIELDS,
+                     names=list(COMMENT_FIELDS),
+                     post=project(row, names, POST_FIELDS))
@@ -0,0 +1,75 @@
+"""Счётчики ссылок постов на файлы картинок в HashedStorage.
+
+Одна картинка, загруженная в несколько постов, хранится одним файлом.
+Файл вместе с миниатюрами sorl удаляется, когда на него не остаётся
+ни одного поста. Файлы, загруженные до HashedStorage, не удаляются никогда:
+раньше их мог разделять кто угодно.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from sorl.thumbnail import delete
+
+from .models import MediaBlob, Post
+from .storage import HASHED_NAME
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name):
+    if not name:
+        return
+    # Строка с нулём видна другим соединениям только вместе с +1: иначе
+    # collect успел бы удалить файл между вставкой и увеличением.
+    with transaction.atomic():
+        MediaBlob.objects.bulk_create(
+            [MediaBlob(name=name, refcount=0)], ignore_conflicts=True)
+        MediaBlob.objects.filter(name=name).update(
+            refcount=F('refcount') + 1)
+
+
+def release(name):
+    if not name:
+        return
+    MediaBlob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1)
+    if MediaBlob.objects.filter(name=name, refcount=0).exists():
+        # Решаем после коммита: откат вернёт ссылку на файл, а пока
+        # транзакция шла, ту же картинку могли загрузить снова.
+        transaction.on_commit(lambda: collect(name))
+
+
+def collect(name):
+    """Удаляет файл без ссылок.
+
+    Счётчик проверяется заново и строка удаляется в одной транзакции с
+    файлом: acquire той же картинки либо успел и файл остаётся, либо ждёт
+    конца транзакции и заводит строку заново.
+    """
+    with transaction.atomic():
+        deleted, _ = MediaBlob.objects.filter(
+            name=name, refcount=0).delete()
+        if deleted and HASHED_NAME.search(name):
+            delete_file(name)
+
+
+def reconcile():
+    """Пересчитывает ссылки по постам, например после массовой загрузки."""
+    names = Post.objects.exclude(image='').values_list(
+        'image', flat=True).distinct().order_by()
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name) for name in names.iterator()],
+        ignore_conflicts=True)
+    total = Post.objects.filter(image=OuterRef('name')).order_by().values(
+        'image').annotate(total=Count('pk')).values('total')
+    MediaBlob.objects.update(refcount=Coalesce(
+        Subquery(total, output_field=IntegerField()), 0))
+
+
+def delete_file(name):
+    try:
+        delete(name)
+    except OSError:
+        logger.exception('Не удалось удалить файл %s', name)
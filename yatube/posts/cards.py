@@ -0,0 +1,58 @@
+"""Кэш готовых карточек постов, общий для всех лент.
+
+Карточка (includes/post.html) одинакова на главной, в группе, в профиле
+и в ленте подписок, поэтому кэшируется по посту, а не по странице. В ключ
+входит версия — хэш всего, что карточка показывает помимо текста: время
+изменения поста, число комментариев, автор, группа и готовые варианты
+картинки. Правка поста, перенос в другую группу, новый комментарий или
+нарезанная картинка дают новый ключ только своей карточке, старые ключи
+истекают сами. Страница берёт все карточки одним get_many и рендерит
+только недостающие.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'includes/post.html'
+
+
+def card_version(post):
+    group = post.group
+    variants = [variant.pk for variant in post.variants.all()]
+    raw = '|'.join(map(str, (
+        post.updated.isoformat(), post.comment_count,
+        post.author.username, post.author.get_full_name(),
+        group.slug if group else '',
+        post.image.name, variants,
+    )))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def card_key(post, lazy):
+    # Картинка первой карточки страницы грузится сразу, остальных — лениво.
+    return f'card:{post.pk}:{card_version(post)}:{int(bool(lazy))}'
+
+
+def render_cards(posts):
+    """HTML карточек постов в том же порядке."""
+    posts = list(posts)
+    keys = [card_key(post, position > 0)
+            for position, post in enumerate(posts)]
+    found = cache.get_many(keys)
+    cards, fresh = [], {}
+    for position, (post, key) in enumerate(zip(posts, keys)):
+        html = found.get(key)
+        if html is None:
+            html = render_to_string(
+                CARD_TEMPLATE, {'post': post, 'lazy': position > 0})
+            # Заглушку, пока картинка режется, не кэшируем: карточка без
+            # кэша заодно снова ставит картинку в очередь.
+            if not post.image or post.variants.all():
+                fresh[key] = html
+        cards.append(mark_safe(html))
+    if fresh:
+        cache.set_many(fresh, settings.CARD_CACHE_TIMEOUT)
+    return cards
@@ -0,0 +1,103 @@
+"""Состояние страниц для кэша и условных запросов (ETag, Last-Modified).
+
+Функции *_state возвращают пару (поколение, время последнего изменения)
+и считаются по кэшу поколений, не загружая саму страницу. Поколение
+служит версией страницы в cache_anonymous, а вместе с пользователем —
+ETag. Время изменения берётся из тех же поколений (generations.modified),
+а не из дат постов: правка, перенос в другую группу и удаление поста или
+комментария дат в таблицах не оставляют. Результат запоминается на
+запросе, чтобы валидаторы и кэш страницы не повторяли одни и те же
+запросы.
+"""
+import hashlib
+from functools import wraps
+
+from django.views.decorators.http import condition
+
+from . import generations
+from .models import Group, Post, User
+
+
+def per_request(func):
+    attr = f'_{func.__name__}'
+
+    @wraps(func)
+    def wrapper(request, **kwargs):
+        if not hasattr(request, attr):
+            setattr(request, attr, func(request, **kwargs))
+        return getattr(request, attr)
+    return wrapper
+
+
+def state_of(*scopes):
+    version = generations.get(*scopes)
+    return version, generations.modified(version)
+
+
+@per_request
+def index_state(request):
+    return state_of(generations.ALL)
+
+
+@per_request
+def group_state(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return None, None
+    return state_of(generations.group_scope(group_id))
+
+
+@per_request
+def profile_state(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None, None
+    return state_of(
+        generations.author_scope(author_id), generations.GROUPS,
+        generations.follow_scope(author_id))
+
+
+@per_request
+def post_state(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        return None, None
+    return state_of(
+        generations.post_scope(post_id),
+        generations.author_scope(author_id), generations.GROUPS)
+
+
+@per_request
+def follow_state(request):
+    if not request.user.is_authenticated:
+        return None, None
+    return state_of(
+        generations.ALL, generations.follow_scope(request.user.pk))
+
+
+def page_version(state):
+    """Версия страницы для core.decorators.cache_anonymous."""
+    def version(request, **kwargs):
+        return state(request, **kwargs)[0]
+    return version
+
+
+def conditional(state):
+    """condition() с ETag и Last-Modified из функции состояния.
+
+    В ETag входит пользователь: шапка и кнопки зависят от того, кто смотрит.
+    """
+    def etag(request, *args, **kwargs):
+        version, modified = state(request, **kwargs)
+        if version is None:
+            return None
+        raw = f'{request.user.pk}:{version}:{modified}'
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return state(request, **kwargs)[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
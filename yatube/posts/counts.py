@@ -0,0 +1,92 @@
+"""Счётчики постов в кэше для постраничного вывода.
+
+Счётчик хранится для каждой области: вся лента, группа, автор. Сигналы
+изменяют его через cache.incr/decr, команда recount_posts пересчитывает
+все счётчики целиком. Лента подписок считается суммой счётчиков авторов,
+поэтому новый пост не приходится раскладывать по счётчикам подписчиков.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Follow, Group, Post, User
+
+ALL_KEY = 'post_count:all'
+
+
+def group_key(group_id):
+    return f'post_count:group:{group_id}'
+
+
+def author_key(author_id):
+    return f'post_count:author:{author_id}'
+
+
+def get_count(key, queryset):
+    """Счётчик из кэша; при промахе считается по queryset."""
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.POST_COUNT_TIMEOUT)
+    return count
+
+
+def author_counts(author_ids):
+    """Счётчики постов для набора авторов: один get_many и один запрос."""
+    keys = {author_key(author_id): author_id for author_id in author_ids}
+    counts = cache.get_many(keys)
+    missing = [keys[key] for key in keys if key not in counts]
+    if missing:
+        found = dict(
+            Post.objects.filter(author__in=missing)
+            .values_list('author').annotate(total=Count('id'))
+            .order_by()
+        )
+        fresh = {
+            author_key(author_id): found.get(author_id, 0)
+            for author_id in missing
+        }
+        cache.set_many(fresh, settings.POST_COUNT_TIMEOUT)
+        counts.update(fresh)
+    return {keys[key]: count for key, count in counts.items()}
+
+
+def get_feed_count(user):
+    """Число постов в ленте подписок пользователя."""
+    author_ids = Follow.objects.filter(user=user).values_list(
+        'author', flat=True)
+    return sum(author_counts(list(author_ids)).values())
+
+
+def adjust(keys, delta):
+    """Сдвигает уже посчитанные счётчики; отсутствующие посчитаются заново."""
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            pass
+
+
+def post_keys(post, group_id=None):
+    keys = [ALL_KEY, author_key(post.author_id)]
+    if group_id:
+        keys.append(group_key(group_id))
+    return keys
+
+
+def recount_all(batch_size=1000):
+    """Полный пересчёт всех счётчиков. Возвращает число записанных ключей."""
+    fresh = {ALL_KEY: Post.objects.count()}
+    by_group = Group.objects.annotate(
+        total=Count('posts')).values_list('id', 'total').order_by()
+    fresh.update((group_key(group_id), total)
+                 for group_id, total in by_group)
+    by_author = User.objects.annotate(
+        total=Count('posts')).values_list('id', 'total').order_by()
+    fresh.update((author_key(author_id), total)
+                 for author_id, total in by_author.iterator())
+    items = list(fresh.items())
+    for start in range(0, len(items), batch_size):
+        cache.set_many(dict(items[start:start + batch_size]),
+                       settings.POST_COUNT_TIMEOUT)
+    return len(items)
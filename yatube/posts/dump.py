@@ -0,0 +1,158 @@
+"""Формат выгрузки данных для export_yatube и import_yatube.
+
+Каждая таблица пишется в свой файл <таблица>.jsonl или <таблица>.csv,
+при желании сжатый gzip (<таблица>.jsonl.gz). Ссылки на пользователей
+и группы хранятся именами и slug, чтобы выгрузку можно было загрузить
+в базу с другими id; посты и комментарии сохраняют свои id, если в базе
+они не заняты другими строками.
+"""
+import csv
+import datetime
+import gzip
+import json
+import os
+
+from .models import Comment, Follow, Group, Post
+
+# Таблица -> (модель, поле выгрузки -> путь для .values()).
+# Порядок важен для загрузки: группы и посты нужны раньше ссылок на них.
+TABLES = {
+    'groups': (Group, {
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    }),
+    'posts': (Post, {
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+    }),
+    'comments': (Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follows': (Follow, {
+        'id': 'id',
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+FORMATS = ('jsonl', 'csv')
+# Поля, по которым export_yatube фильтрует таблицы.
+DATE_FIELDS = {'posts': 'pub_date', 'comments': 'created'}
+AUTHOR_FIELDS = {
+    'posts': 'author__username',
+    'comments': 'author__username',
+    'follows': 'author__username',
+}
+GROUP_FIELDS = {
+    'groups': 'slug',
+    'posts': 'group__slug',
+    'comments': 'post__group__slug',
+}
+
+
+def encode_value(value):
+    # Даты пишутся с микросекундами: DjangoJSONEncoder их округляет.
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} не сериализуется в выгрузку')
+
+
+def encode(row):
+    return json.dumps(row, ensure_ascii=False, default=encode_value)
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def dump_path(directory, table, fmt, compress=False):
+    name = f'{table}.{fmt}' + ('.gz' if compress else '')
+    return os.path.join(directory, name)
+
+
+def find_dump(directory, table):
+    """Путь к файлу таблицы в каталоге выгрузки и его формат, или None."""
+    for fmt in FORMATS:
+        for compress in (False, True):
+            path = dump_path(directory, table, fmt, compress)
+            if os.path.exists(path):
+                return path, fmt
+    return None
+
+
+def open_dump(path, mode='r'):
+    """Текстовый файл выгрузки; .gz открывается через gzip."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def export_rows(table, since=None, until=None, author=None, group=None,
+                after=None, chunk_size=2000):
+    """Строки таблицы по возрастанию id, порциями по chunk_size.
+
+    Фильтры применяются к тем таблицам, где они имеют смысл: даты — к
+    постам и комментариям, автор — ко всему, где он есть, группа — к
+    группам, постам и комментариям к постам группы. after — курсор: id
+    последней уже выгруженной строки.
+    """
+    model, fields = TABLES[table]
+    queryset = model.objects.all()
+    date_field = DATE_FIELDS.get(table)
+    if date_field and since:
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    if date_field and until:
+        queryset = queryset.filter(**{f'{date_field}__lt': until})
+    if author and table in AUTHOR_FIELDS:
+        queryset = queryset.filter(**{AUTHOR_FIELDS[table]: author})
+    if group and table in GROUP_FIELDS:
+        queryset = queryset.filter(**{GROUP_FIELDS[table]: group})
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    names = list(fields)
+    rows = queryset.order_by('id').values_list(*fields.values())
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(names, row))
+
+
+def write_rows(file, fmt, names, rows, header=True):
+    """Пишет строки-словари в файл. Возвращает число строк."""
+    total = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(file, names)
+        if header:
+            writer.writeheader()
+        for row in rows:
+            writer.writerow(
+                {name: csv_value(value) for name, value in row.items()})
+            total += 1
+    else:
+        for row in rows:
+            file.write(encode(row) + '\n')
+            total += 1
+    return total
+
+
+def read_rows(file, fmt):
+    """Строки-словари из файла; пустые значения CSV становятся None."""
+    if fmt == 'csv':
+        for row in csv.DictReader(file):
+            yield {name: value if value != '' else None
+                   for name, value in row.items()}
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
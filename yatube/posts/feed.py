@@ -0,0 +1,95 @@
+"""Материализованная лента подписок (FeedEntry).
+
+Пост раскладывается по лентам подписчиков при публикации (fan-out on write),
+при подписке лента дополняется последними TIMELINE_LENGTH постами автора,
+при отписке — чистится. Более старые посты нового автора в FeedEntry не
+попадают: подписка на плодовитого автора не должна писать в запросе тысячи
+строк. FeedEntry нужна только для первых TIMELINE_LENGTH записей ленты,
+глубже её читает posts.timeline из Post.
+"""
+from django.conf import settings
+from django.db import connection
+
+from . import timeline
+from .models import FeedEntry, Follow, Post
+
+
+def _bulk_insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=settings.FEED_BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Кладёт новый пост в ленты всех подписчиков автора.
+
+    Посты «звёзд» не раскладываются: одна публикация не должна писать
+    строку на каждого из тысяч подписчиков. Их подмешивает при чтении
+    posts.timeline.
+    """
+    if timeline.celebrity_flags([post.author_id])[post.author_id]:
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    batch = []
+    for user_id in follower_ids.iterator():
+        batch.append(FeedEntry(user_id=user_id, post_id=post.pk,
+                               pub_date=post.pub_date))
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            _bulk_insert(batch)
+            batch = []
+    _bulk_insert(batch)
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты автора."""
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', 'pub_date')
+    _bulk_insert([
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts[:settings.TIMELINE_LENGTH]])
+
+
+def backfill_follows(follows):
+    """backfill_feed для выборки подписок одним INSERT ... SELECT.
+
+    Последние посты каждого автора нумерует оконная функция, уже
+    разложенные записи пропускаются.
+    """
+    follow_sql, follow_params = follows.order_by().values(
+        'user_id', 'author_id').query.sql_with_params()
+    entries, posts = FeedEntry._meta.db_table, Post._meta.db_table
+    sql = f"""
+        INSERT INTO {entries} (user_id, post_id, pub_date)
+        SELECT follow.user_id, recent.id, recent.pub_date
+        FROM ({follow_sql}) follow
+        INNER JOIN (
+            SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+            ) AS place
+            FROM {posts}
+            WHERE author_id IN (SELECT author_id FROM ({follow_sql}) followed)
+        ) recent ON recent.author_id = follow.author_id
+        WHERE recent.place <= %s AND NOT EXISTS (
+            SELECT 1 FROM {entries} existing
+            WHERE existing.user_id = follow.user_id
+                AND existing.post_id = recent.id)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*follow_params, *follow_params,
+                             settings.TIMELINE_LENGTH))
+
+
+def demote(author_id):
+    """Автор перестал быть «звездой»: его посты больше не подмешиваются при
+    чтении, поэтому раскладываются по лентам подписчиков, как при подписке.
+    """
+    backfill_follows(Follow.objects.filter(author_id=author_id))
+    timeline.forget_followers(author_id)
+
+
+def prune_feed(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки."""
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        post__in=Post.objects.filter(author_id=author_id).values('id'),
+    ).delete()
@@ -0,0 +1,160 @@
+"""RSS- и Atom-ленты сайта, групп и авторов.
+
+Лента пишется потоком: строки постов читаются через iterator(chunk_size)
+и отдаются клиенту по одному элементу, так что окно ленты любой длины не
+собирается в памяти целиком. Читалки опрашивают ленты постоянно, поэтому
+ответы поддерживают ETag/Last-Modified и короткий публичный Cache-Control.
+"""
+import io
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .conditional import conditional, group_state, index_state, profile_state
+from .models import Group, Post, User
+from .utils import FEED_ORDERING
+
+CONTENT_TYPES = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+}
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+
+
+def feed_state(state):
+    """Функция состояния страницы для ленты: формат на состояние не влияет."""
+    def wrapper(request, kind, **kwargs):
+        return state(request, **kwargs)
+    return wrapper
+
+
+def post_rows(posts):
+    """Строки ленты без моделей, порциями по FEED_CHUNK_SIZE."""
+    rows = posts.order_by(*FEED_ORDERING).values_list(
+        'id', 'text', 'pub_date', 'author__username', 'group__title')
+    return rows[:settings.FEED_ITEMS].iterator(
+        chunk_size=settings.FEED_CHUNK_SIZE)
+
+
+class FeedWriter:
+    """Пишет ленту в SimplerXMLGenerator и отдаёт накопленное по частям."""
+
+    def __init__(self, request, title, link, updated):
+        self.request = request
+        self.title = title
+        self.link = request.build_absolute_uri(link)
+        self.updated = updated
+        self.buffer = io.StringIO()
+        self.xml = SimplerXMLGenerator(self.buffer, 'utf-8')
+
+    def flush(self):
+        chunk = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return chunk
+
+    def post_link(self, post_id):
+        return self.request.build_absolute_uri(
+            reverse('posts:post_detail', kwargs={'post_id': post_id}))
+
+    def rss(self, rows):
+        xml = self.xml
+        xml.startDocument()
+        xml.startElement('rss', {'version': '2.0'})
+        xml.startElement('channel', {})
+        xml.addQuickElement('title', self.title)
+        xml.addQuickElement('link', self.link)
+        xml.addQuickElement('description', self.title)
+        xml.addQuickElement('language', settings.LANGUAGE_CODE)
+        if self.updated:
+            xml.addQuickElement('lastBuildDate', rfc2822_date(self.updated))
+        yield self.flush()
+        for post_id, text, pub_date, author, group in rows:
+            link = self.post_link(post_id)
+            xml.startElement('item', {})
+            xml.addQuickElement('title', text[:settings.SYMBOLS_POST])
+            xml.addQuickElement('link', link)
+            xml.addQuickElement('description', text)
+            xml.addQuickElement('pubDate', rfc2822_date(pub_date))
+            xml.addQuickElement('guid', link, {'isPermaLink': 'true'})
+            if group:
+                xml.addQuickElement('category', group)
+            xml.endElement('item')
+            yield self.flush()
+        xml.endElement('channel')
+        xml.endElement('rss')
+        yield self.flush()
+
+    def atom(self, rows):
+        xml = self.xml
+        xml.startDocument()
+        xml.startElement('feed', {'xmlns': ATOM_NS, 'xml:lang': 'ru'})
+        xml.addQuickElement('title', self.title)
+        xml.addQuickElement('link', '', {'rel': 'alternate',
+                                         'href': self.link})
+        xml.addQuickElement('link', '', {
+            'rel': 'self',
+            'href': self.request.build_absolute_uri()})
+        xml.addQuickElement('id', self.link)
+        if self.updated:
+            xml.addQuickElement('updated', rfc3339_date(self.updated))
+        yield self.flush()
+        for post_id, text, pub_date, author, group in rows:
+            link = self.post_link(post_id)
+            xml.startElement('entry', {})
+            xml.addQuickElement('title', text[:settings.SYMBOLS_POST])
+            xml.addQuickElement('link', '', {'rel': 'alternate',
+                                             'href': link})
+            xml.addQuickElement('id', link)
+            xml.addQuickElement('published', rfc3339_date(pub_date))
+            xml.addQuickElement('updated', rfc3339_date(pub_date))
+            xml.startElement('author', {})
+            xml.addQuickElement('name', author)
+            xml.endElement('author')
+            if group:
+                xml.addQuickElement('category', '', {'term': group})
+            xml.addQuickElement('content', text, {'type': 'text'})
+            xml.endElement('entry')
+            yield self.flush()
+        xml.endElement('feed')
+        yield self.flush()
+
+
+def feed_response(request, kind, posts, title, link, updated):
+    writer = FeedWriter(request, title, link, updated)
+    chunks = getattr(writer, kind)(post_rows(posts))
+    response = StreamingHttpResponse(
+        chunks, content_type=CONTENT_TYPES[kind])
+    patch_cache_control(response, public=True, max_age=settings.FEED_MAX_AGE)
+    return response
+
+
+@conditional(feed_state(index_state))
+def index(request, kind):
+    return feed_response(
+        request, kind, Post.objects.all(), 'Последние обновления на сайте',
+        reverse('posts:index'), index_state(request)[1])
+
+
+@conditional(feed_state(group_state))
+def group_posts(request, kind, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(
+        request, kind, group.posts.all(), f'Записи сообщества {group.title}',
+        reverse('posts:group_list', kwargs={'slug': slug}),
+        group_state(request, slug=slug)[1])
+
+
+@conditional(feed_state(profile_state))
+def profile(request, kind, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(
+        request, kind, author.posts.all(),
+        f'Все посты пользователя {author.get_full_name() or username}',
+        reverse('posts:profile', kwargs={'username': username}),
+        profile_state(request, username=username)[1])
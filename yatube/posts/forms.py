@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Comment, Post
+from .uploads import downscale, validate_image
 
 
 class PostForm(forms.ModelForm):
@@ -14,6 +16,14 @@ class PostForm(forms.ModelForm):
             "text": "Текст поста",
             "group": "Группа"}
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Новая загрузка; при правке без новой картинки здесь FieldFile.
+        if isinstance(image, UploadedFile):
+            validate_image(image)
+            image = downscale(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,88 @@
+"""Поколения кэша для фрагментов страниц.
+
+Каждая область (вся лента, группа, автор, группы вообще) хранит в кэше
+номер поколения. Номер входит в ключ {% cache %}, поэтому фрагмент может
+жить часами: сигналы увеличивают номер при изменении постов, комментариев
+и групп, и следующий запрос просто не найдёт старый ключ.
+
+Номер — время последнего сдвига в микросекундах, поэтому по поколениям
+страницы виден и её Last-Modified (см. modified).
+"""
+import datetime
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+ALL = 'all'
+# Заголовки и адреса групп видны на любых страницах с постами.
+GROUPS = 'groups'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def follow_scope(author_id):
+    return f'follow:{author_id}'
+
+
+def _key(scope):
+    return f'generation:{scope}'
+
+
+def _initial():
+    # После вытеснения из кэша поколение начинается с текущего времени,
+    # а не с нуля, чтобы не совпасть со старыми ключами фрагментов.
+    return time.time_ns() // 1000
+
+
+def get(*scopes):
+    """Поколения областей одной строкой для ключа фрагмента."""
+    keys = [_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial(), None)
+            found[key] = cache.get(key)
+    return '.'.join(str(found[key]) for key in keys)
+
+
+def bump(*scopes):
+    """Сдвигает поколения: закэшированные фрагменты областей устаревают.
+
+    Поколение дотягивается до текущего времени. incr атомарен, поэтому
+    параллельные сдвиги всё равно дают разные номера.
+    """
+    keys = [_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    now = _initial()
+    for key in keys:
+        try:
+            cache.incr(key, max(now - found.get(key, now), 1))
+        except ValueError:
+            cache.add(key, now, None)
+
+
+def modified(version):
+    """Время последнего изменения по строке поколений из get()."""
+    latest = max(int(part) for part in version.split('.'))
+    return datetime.datetime.fromtimestamp(
+        latest / 10 ** 6, tz=timezone.utc)
+
+
+def post_scopes(author_id, *group_ids, post_id=None):
+    """Области, которые показывают пост автора из этих групп."""
+    scopes = [ALL, author_scope(author_id)]
+    if post_id is not None:
+        scopes.append(post_scope(post_id))
+    scopes.extend(group_scope(group_id) for group_id in group_ids if group_id)
+    return scopes
@@ -0,0 +1,89 @@
+"""Обслуживание после массовой записи в обход сигналов.
+
+bulk_create не вызывает сигналы posts.signals, поэтому счётчики, ленты
+подписок, ссылки на картинки и поколения кэша после массовой загрузки
+пересчитываются здесь разом.
+"""
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection
+
+from . import blobs, counts, feed, generations, stats, timeline
+from .models import Follow
+
+# Не больше стольких значений в одном условии IN (лимит параметров SQLite).
+IN_CHUNK_SIZE = 500
+
+
+def chunked(iterable, size):
+    """Списки по size элементов из iterable."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+@contextmanager
+def explicit_dates(*models):
+    """auto_now и auto_now_add на время блока не трогают заданные даты.
+
+    Нужно для bulk_create строк с датами из выгрузки или генератора.
+    """
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(
+                    field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def reset_sequences(*models):
+    """Счётчики автоинкремента после вставки строк с явными id.
+
+    На PostgreSQL следующий id иначе совпал бы с уже занятым; SQLite
+    берёт следующий id из максимального сам.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def rebuild_derived(author_ids=(), group_ids=(), user_ids=()):
+    """Производные данные после массовой загрузки.
+
+    author_ids — авторы новых постов, group_ids — их группы, user_ids —
+    пользователи с новыми подписками.
+    """
+    author_ids, user_ids = set(author_ids), set(user_ids)
+    stats.reconcile()
+    # Ленты подписчиков новых авторов и новых подписок.
+    pairs = set()
+    for lookup, ids in (('author__in', author_ids), ('user__in', user_ids)):
+        for chunk in chunked(sorted(ids), IN_CHUNK_SIZE):
+            follows = Follow.objects.filter(**{lookup: chunk})
+            pairs.update(follows.values_list('user_id', 'author_id'))
+            feed.backfill_follows(follows)
+    readers = {user_id for user_id, _ in pairs}
+    followed = {author_id for _, author_id in pairs}
+    cache.delete_many(
+        [timeline.timeline_key(user_id) for user_id in readers]
+        + [timeline.celebrity_key(author_id) for author_id in followed])
+    counts.recount_all()
+    blobs.reconcile()
+    generations.bump(
+        generations.ALL, generations.GROUPS,
+        *[generations.group_scope(group_id) for group_id in set(group_ids)],
+        *[generations.author_scope(author_id) for author_id in author_ids],
+        *[generations.follow_scope(user_id)
+          for user_id in readers | followed])
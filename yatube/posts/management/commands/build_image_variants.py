@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.models import ImageVariant, Post
+from posts.thumbnails import prepare
+
+
+class Command(BaseCommand):
+    help = ('Готовит варианты картинок для постов, у которых их ещё нет '
+            '(например, загруженных до появления srcset).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true',
+                            help='Заново резать и картинки с отметкой '
+                                 'об ошибке.')
+
+    def handle(self, *args, **options):
+        missing = Q(variants__isnull=True)
+        if options['failed']:
+            missing |= Q(variants__format=ImageVariant.FAILED)
+        post_ids = Post.objects.exclude(image='').filter(
+            missing).values_list('pk', flat=True).distinct()
+        total = failed = 0
+        for post_id in list(post_ids):
+            if not prepare(post_id):
+                failed += 1
+            total += 1
+        self.stdout.write(
+            f'Подготовлено картинок: {total - failed}, с ошибкой: {failed}')
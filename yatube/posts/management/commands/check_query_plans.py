@@ -0,0 +1,152 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from posts.models import Follow, Group, Post, User
+from posts.utils import encode_cursor
+
+# Полный проход по таблице; SCAN виртуальной таблицы FTS5 допустим.
+FULL_SCAN = re.compile(r'\bSCAN (?!.*\b(?:USING|VIRTUAL)\b)')
+# Проход индекса от начала. Допустим только для страницы с LIMIT без
+# условия по диапазону: такой проход останавливается на LIMIT строк. Если
+# в запросе есть < или >, план обязан искать диапазон (SEARCH), иначе
+# стоимость страницы растёт с глубиной.
+INDEX_WALK = re.compile(r'\bSCAN .*\bUSING (?:COVERING )?INDEX\b')
+RANGE = re.compile(r' [<>]=? %s')
+TEMP_SORT = 'USE TEMP B-TREE'
+# COUNT(*) проходит индекс целиком по природе; результат хранит
+# posts.counts, поэтому такие запросы только показываются.
+COUNT = 'COUNT(*)'
+# Сортировка по релевантности поиска не может идти по индексу.
+SEARCH = ' MATCH '
+# Строки по списку ключей (id постов страницы): сортируется не больше
+# строк, чем ключей в списке.
+KEY_LIST = re.compile(r' IN \(%s')
+# Пустой кэш: иначе часть запросов представлений не выполнится.
+EMPTY_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'check_query_plans',
+    },
+}
+
+
+def view_urls():
+    """(адрес, пользователь) страниц posts на образцах из базы.
+
+    Значения курсоров условные: планировщику SQLite важна форма запроса,
+    а не данные.
+    """
+    anonymous = AnonymousUser()
+    before = '?before=' + encode_cursor((timezone.now(), 1))
+    yield reverse('posts:index'), anonymous
+    yield reverse('posts:index') + before, anonymous
+    yield reverse('posts:index') + '?page=2', anonymous
+    yield reverse('posts:search') + '?q=пост', anonymous
+    yield reverse('posts:search') + '?q=пост&page=2', anonymous
+    yield reverse('posts:rss'), anonymous
+    yield reverse('posts:api_index') + before, anonymous
+    group = Group.objects.order_by('pk').first()
+    if group is not None:
+        url = reverse('posts:group_list', kwargs={'slug': group.slug})
+        yield url, anonymous
+        yield url + before, anonymous
+        yield url + '?page=2', anonymous
+    author = User.objects.filter(posts__isnull=False).order_by('pk').first()
+    if author is not None:
+        url = reverse('posts:profile', kwargs={'username': author.username})
+        yield url, anonymous
+        yield url + before, anonymous
+        yield url + '?page=2', anonymous
+        yield reverse('posts:profile_atom',
+                      kwargs={'username': author.username}), anonymous
+    post = Post.objects.order_by('pk').first()
+    if post is not None:
+        yield reverse('posts:post_detail',
+                      kwargs={'post_id': post.pk}), anonymous
+        yield reverse('posts:comments', kwargs={'post_id': post.pk}) + (
+            '?after=' + encode_cursor((timezone.now(), 1))), anonymous
+        yield reverse('posts:api_post_detail',
+                      kwargs={'post_id': post.pk}), anonymous
+    follow = Follow.objects.order_by('pk').first()
+    reader = follow.user if follow else User.objects.order_by('pk').first()
+    if reader is not None:
+        url = reverse('posts:follow_index')
+        yield url, reader
+        yield url + before, reader
+        yield url + '?page=2', reader
+        yield reverse('posts:api_follow_index') + before, reader
+
+
+def run_view(url, user):
+    """Выполняет представление по адресу; вернёт его SQL с параметрами."""
+    request = RequestFactory().get(url)
+    request.user = user
+    match = resolve(request.path_info)
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        response = match.func(request, *match.args, **match.kwargs)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return queries
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def problems_of(sql, plan):
+    """Строки плана, которые означают проход без нужного индекса."""
+    limited = ' LIMIT ' in sql and not RANGE.search(sql)
+    for line in plan:
+        if FULL_SCAN.search(line):
+            yield line
+        elif INDEX_WALK.search(line) and not limited and COUNT not in sql:
+            yield line
+        elif TEMP_SORT in line and not (
+                SEARCH in sql or KEY_LIST.search(sql)):
+            yield line
+
+
+class Command(BaseCommand):
+    help = ('Выполняет представления posts на образцах из базы и '
+            'проверяет планы всех их запросов: полный проход по таблице, '
+            'проход индекса без диапазона и сортировка во временном '
+            'B-дереве — ошибка.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка рассчитана на планы SQLite.')
+        problems = []
+        seen = set()
+        with override_settings(CACHES=EMPTY_CACHE):
+            for url, user in view_urls():
+                self.stdout.write(url)
+                for sql, params in run_view(url, user):
+                    if sql in seen:
+                        continue
+                    seen.add(sql)
+                    plan = explain(sql, params)
+                    self.stdout.write(f'  {sql}')
+                    for line in plan:
+                        self.stdout.write(f'    {line}')
+                    problems.extend(
+                        f'{url}: {line}' for line in problems_of(sql, plan))
+        if problems:
+            raise CommandError(
+                'Запросы без подходящего индекса:\n' + '\n'.join(problems))
+        self.stdout.write('Все запросы используют индексы.')
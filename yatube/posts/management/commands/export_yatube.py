@@ -0,0 +1,108 @@
+import argparse
+import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts import dump
+
+
+def parse_moment(value):
+    """Дата или дата со временем из командной строки."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise argparse.ArgumentTypeError(
+                f'Не удалось разобрать дату: {value}')
+        moment = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_cursor(value):
+    """Курсор --after: таблица=id или просто id для одной таблицы."""
+    table, _, raw = value.rpartition('=')
+    if table and table not in dump.TABLES:
+        raise argparse.ArgumentTypeError(f'Нет такой таблицы: {table}')
+    try:
+        return table or None, int(raw)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Курсор не число: {raw}')
+
+
+def track(rows, last):
+    """Пропускает строки, запоминая в last['id'] последний выгруженный id."""
+    for row in rows:
+        last['id'] = row['id']
+        yield row
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в JSONL или '
+            'CSV, читая таблицы порциями без загрузки целиком в память.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для файлов выгрузки.')
+        parser.add_argument('--format', choices=dump.FORMATS,
+                            default='jsonl')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Сжимать файлы gzip.')
+        parser.add_argument('--tables', nargs='+', choices=list(dump.TABLES),
+                            default=list(dump.TABLES))
+        parser.add_argument('--since', type=parse_moment,
+                            help='Посты и комментарии не раньше даты.')
+        parser.add_argument('--until', type=parse_moment,
+                            help='Посты и комментарии раньше даты.')
+        parser.add_argument('--author', help='Имя пользователя-автора.')
+        parser.add_argument('--group', help='slug группы.')
+        parser.add_argument(
+            '--after', type=parse_cursor, nargs='+', default=[],
+            metavar='ТАБЛИЦА=ID',
+            help='Продолжить выгрузку таблицы после строки с этим id; '
+                 'строки дописываются в существующий файл. У каждой '
+                 'таблицы свои id, поэтому курсор задаётся по таблице, '
+                 'например --after posts=123.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def cursors(self, options):
+        """{таблица: id} из --after."""
+        cursors = dict(options['after'])
+        if None in cursors:
+            if len(options['after']) > 1 or len(options['tables']) != 1:
+                raise CommandError(
+                    '--after без таблицы допустим только для одной таблицы '
+                    'в --tables; укажите --after таблица=id.')
+            cursors = {options['tables'][0]: cursors[None]}
+        unknown = sorted(set(cursors) - set(options['tables']))
+        if unknown:
+            raise CommandError(
+                'Курсор для таблиц не из --tables: ' + ', '.join(unknown))
+        return cursors
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        cursors = self.cursors(options)
+        os.makedirs(directory, exist_ok=True)
+        for table in options['tables']:
+            path = dump.dump_path(
+                directory, table, options['format'], options['gzip'])
+            after = cursors.get(table)
+            resume = after is not None
+            header = not (resume and os.path.exists(path)
+                          and os.path.getsize(path))
+            last = {'id': after}
+            rows = dump.export_rows(
+                table, since=options['since'], until=options['until'],
+                author=options['author'], group=options['group'],
+                after=after, chunk_size=options['chunk_size'])
+            with dump.open_dump(path, 'a' if resume else 'w') as file:
+                total = dump.write_rows(
+                    file, options['format'], list(dump.TABLES[table][1]),
+                    track(rows, last), header=header)
+            self.stdout.write(
+                f'{table}: {total} строк в {path}, курсор --after '
+                f'{table}={last["id"] if last["id"] is not None else 0}')
@@ -0,0 +1,248 @@
+import os
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import dump, maintenance, search
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        raise CommandError(f'Не удалось разобрать дату: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = ('Загружает выгрузку export_yatube (JSONL или CSV, можно gzip) '
+            'пакетами bulk_create. Счётчики, ленты подписок и поисковый '
+            'индекс пересчитываются один раз в конце. Посты и комментарии '
+            'сохраняют свои id; если id в базе занят другой строкой, '
+            'строка получает новый id, а комментарии — новый id поста.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с файлами выгрузки.')
+        parser.add_argument('--tables', nargs='+', choices=list(dump.TABLES),
+                            default=list(dump.TABLES))
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Строк в одной транзакции.')
+        parser.add_argument(
+            '--media',
+            help='Каталог с картинками постов, пути как в поле image.')
+
+    def handle(self, *args, **options):
+        self.media = options['media']
+        self.user_ids = {}
+        self.group_ids = {}
+        # id постов выгрузки, которые есть в базе, и новые id постов,
+        # чей id был занят другим постом.
+        self.post_ids = array('q')
+        self.moved_posts = {}
+        self.next_ids = {Post: 0, Comment: 0}
+        self.skipped, self.moved = Counter(), Counter()
+        self.authors, self.groups, self.readers = set(), set(), set()
+        self.missing_images = 0
+        dumps = [(table, dump.find_dump(options['directory'], table))
+                 for table in dump.TABLES if table in options['tables']]
+        if not any(found for _, found in dumps):
+            raise CommandError(
+                f'В каталоге {options["directory"]} нет файлов выгрузки.')
+        present = dict(dumps)
+        if present.get('comments') and not present.get('posts'):
+            raise CommandError(
+                'Комментарии загружаются только вместе с постами выгрузки: '
+                'id постов в базе могут не совпадать с выгрузкой.')
+        with search.deferred_index(), maintenance.explicit_dates(
+                Post, Comment):
+            for table, found in dumps:
+                if found is None:
+                    continue
+                path, fmt = found
+                load = getattr(self, f'load_{table}')
+                total = 0
+                with dump.open_dump(path) as file:
+                    rows = dump.read_rows(file, fmt)
+                    for batch in maintenance.chunked(
+                            rows, options['batch_size']):
+                        with transaction.atomic():
+                            load(batch)
+                        total += len(batch)
+                if table == 'posts':
+                    self.post_ids = array('q', sorted(self.post_ids))
+                self.stdout.write(
+                    f'{table}: прочитано строк {total}, пропущено '
+                    f'{self.skipped[table]}, с новым id {self.moved[table]}')
+        # Посты и комментарии загружены со своими id.
+        maintenance.reset_sequences(Post, Comment)
+        maintenance.rebuild_derived(
+            author_ids=self.authors, group_ids=self.groups,
+            user_ids=self.readers)
+        if self.missing_images:
+            self.stdout.write(
+                f'Картинок не найдено в --media: {self.missing_images}')
+        self.stdout.write(
+            'Производные данные пересчитаны. Варианты картинок готовит '
+            'команда build_image_variants.')
+
+    def users(self, names):
+        """{username: id}; недостающие пользователи создаются без пароля."""
+        missing = {name for name in names if name not in self.user_ids}
+        if missing:
+            User.objects.bulk_create(
+                [User(username=name, password=make_password(None))
+                 for name in missing],
+                ignore_conflicts=True)
+            self.user_ids.update(User.objects.filter(
+                username__in=missing).values_list('username', 'pk'))
+        return self.user_ids
+
+    def group_id(self, slug):
+        if slug is None:
+            return None
+        if slug not in self.group_ids:
+            self.group_ids[slug] = Group.objects.filter(
+                slug=slug).values_list('pk', flat=True).first()
+        return self.group_ids[slug]
+
+    def image(self, name):
+        """Имя картинки в хранилище; из --media файл копируется заново."""
+        if not name or not self.media:
+            return name or ''
+        path = os.path.join(self.media, name)
+        if not os.path.isfile(path):
+            self.missing_images += 1
+            return ''
+        field = Post._meta.get_field('image')
+        with open(path, 'rb') as content:
+            return field.storage.save(
+                field.generate_filename(None, os.path.basename(name)),
+                File(content))
+
+    def spare_id(self, model, rows):
+        """id для строки, чей id из выгрузки занят другой строкой.
+
+        Выше всех id в базе и в пачке, чтобы не занять чужой id дальше.
+        """
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        spare = max(self.next_ids[model], last + 1,
+                    max(int(row['id']) for row in rows) + 1)
+        self.next_ids[model] = spare + 1
+        return spare
+
+    def place(self, model, objects, fields, rows, table):
+        """Загружает строки, которых ещё нет в базе; занятые id заменяются.
+
+        Строка считается уже загруженной, если в базе есть строка с теми
+        же fields: с её id или, после прошлой замены, с другим. Вернёт
+        {id из выгрузки: id в базе} для всех строк пачки.
+        """
+        def values(item):
+            return tuple(getattr(item, field) for field in fields)
+
+        existing = {
+            row.pk: values(row)
+            for row in model.objects.filter(
+                pk__in=[item.pk for item in objects])
+        }
+        fresh, ids = [], {}
+        for item in objects:
+            dump_id = item.pk
+            if dump_id in existing:
+                twin = dump_id if existing[dump_id] == values(item) else (
+                    model.objects.filter(**dict(zip(fields, values(item))))
+                    .values_list('pk', flat=True).first())
+                if twin is not None:
+                    self.skipped[table] += 1
+                    ids[dump_id] = twin
+                    continue
+                item.pk = self.spare_id(model, rows)
+                self.moved[table] += 1
+            ids[dump_id] = item.pk
+            fresh.append(item)
+        model.objects.bulk_create(fresh)
+        return ids
+
+    def load_groups(self, rows):
+        slugs = set(Group.objects.filter(
+            slug__in=[row['slug'] for row in rows]).values_list(
+            'slug', flat=True))
+        self.skipped['groups'] += len(slugs)
+        Group.objects.bulk_create(
+            [Group(title=row['title'], slug=row['slug'],
+                   description=row['description'] or '')
+             for row in rows if row['slug'] not in slugs],
+            ignore_conflicts=True)
+
+    def load_posts(self, rows):
+        users = self.users({row['author'] for row in rows})
+        posts = []
+        for row in rows:
+            pub_date = parse_moment(row['pub_date'])
+            posts.append(Post(
+                id=int(row['id']),
+                text=row['text'],
+                pub_date=pub_date,
+                updated=pub_date,
+                author_id=users[row['author']],
+                group_id=self.group_id(row['group']),
+                image=self.image(row['image']),
+            ))
+        ids = self.place(Post, posts, ('author_id', 'pub_date', 'text'),
+                         rows, 'posts')
+        for dump_id, post_id in ids.items():
+            self.post_ids.append(dump_id)
+            if dump_id != post_id:
+                self.moved_posts[dump_id] = post_id
+        self.authors.update(post.author_id for post in posts)
+        self.groups.update(post.group_id for post in posts if post.group_id)
+
+    def post_id(self, dump_id):
+        """id поста в базе по id из выгрузки или None, если его там нет."""
+        position = bisect_left(self.post_ids, dump_id)
+        if (position == len(self.post_ids)
+                or self.post_ids[position] != dump_id):
+            return None
+        return self.moved_posts.get(dump_id, dump_id)
+
+    def load_comments(self, rows):
+        users = self.users({row['author'] for row in rows})
+        comments = []
+        for row in rows:
+            post_id = self.post_id(int(row['post']))
+            if post_id is None:
+                # Поста нет в выгрузке: не прикрепляем к чужому.
+                self.skipped['comments'] += 1
+                continue
+            comments.append(Comment(
+                id=int(row['id']), post_id=post_id,
+                author_id=users[row['author']], text=row['text'],
+                created=parse_moment(row['created'])))
+        self.place(Comment, comments,
+                   ('post_id', 'author_id', 'created', 'text'), rows,
+                   'comments')
+
+    def load_follows(self, rows):
+        users = self.users(
+            {row['user'] for row in rows} | {row['author'] for row in rows})
+        pairs = {(users[row['user']], users[row['author']]) for row in rows
+                 if row['user'] != row['author']}
+        existing = set(Follow.objects.filter(
+            user__in={user_id for user_id, _ in pairs},
+            author__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'))
+        follows = [Follow(user_id=user_id, author_id=author_id)
+                   for user_id, author_id in pairs - existing]
+        self.skipped['follows'] += len(rows) - len(follows)
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        self.readers.update(follow.user_id for follow in follows)
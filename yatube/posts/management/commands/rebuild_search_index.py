@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов (FTS5).'
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write('Полнотекстовый индекс есть только в SQLite.')
+            return
+        rebuild_index()
+        self.stdout.write('Индекс поиска перестроен.')
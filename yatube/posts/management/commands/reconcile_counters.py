@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает хранимые счётчики комментариев, постов '
+            'и подписок, если они разошлись с таблицами.')
+
+    def handle(self, *args, **options):
+        total = reconcile()
+        self.stdout.write(f'Пересчитано профилей: {total}')
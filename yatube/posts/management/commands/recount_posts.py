@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.counts import recount_all
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов в кэше. '
+            'Запускается по расписанию, например раз в час из cron.')
+
+    def handle(self, *args, **options):
+        total = recount_all()
+        self.stdout.write(f'Пересчитано счётчиков: {total}')
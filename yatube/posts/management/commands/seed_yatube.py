@@ -0,0 +1,198 @@
+import argparse
+import datetime
+import random
+from array import array
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from faker import Faker
+
+from posts import maintenance, search
+from posts.models import Comment, Follow, Group, Post, User
+
+# Столько готовых предложений Faker; тексты собираются из них, потому что
+# генерировать каждое предложение заново для миллионов строк слишком долго.
+SENTENCE_POOL = 5000
+# Доля постов без группы.
+NO_GROUP_SHARE = 0.2
+# От этого момента по умолчанию отсчитываются даты: с одним seed данные
+# одинаковы при любом запуске.
+EPOCH = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        raise argparse.ArgumentTypeError(f'Не удалось разобрать дату: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками с неравномерным '
+            'распределением: немногие авторы, группы и посты собирают '
+            'большую часть постов, подписчиков и комментариев.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней до --now разбросать '
+                                 'даты постов.')
+        parser.add_argument('--now', type=parse_moment, default=EPOCH,
+                            help='Самая поздняя дата постов и '
+                                 'комментариев, по умолчанию '
+                                 f'{EPOCH.isoformat()}.')
+        parser.add_argument('--skew', type=float, default=3.0,
+                            help='Перекос распределений; 1 — равномерно.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.skew = options['skew']
+        self.batch_size = options['batch_size']
+        self.now = options['now']
+        self.author_ids, self.reader_ids = set(), set()
+        self.sentences = [
+            self.fake.sentence() for _ in range(SENTENCE_POOL)]
+        with search.deferred_index(), maintenance.explicit_dates(
+                Post, Comment):
+            users = self.save(User, self.make_users(options['users']))
+            groups = self.save(Group, self.make_groups(options['groups']))
+            posts = self.save(Post, self.make_posts(
+                options['posts'], users, groups, options['days']))
+            self.save(Comment, self.make_comments(
+                options['comments'], users, posts))
+            self.save(Follow, self.make_follows(options['follows'], users),
+                      ignore_conflicts=True)
+        maintenance.reset_sequences(User, Group, Post, Comment)
+        self.stdout.write('Пересчёт производных данных...')
+        maintenance.rebuild_derived(
+            author_ids=self.author_ids, group_ids=groups,
+            user_ids=self.reader_ids)
+        self.stdout.write('Готово.')
+
+    def save(self, model, objects, ignore_conflicts=False):
+        """bulk_create пакетами, по транзакции на пакет.
+
+        Возвращает диапазон id новых строк. У подписок id не задаются,
+        для них важна только длина диапазона.
+        """
+        first = next_id(model)
+        total = 0
+        for batch in maintenance.chunked(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    batch, ignore_conflicts=ignore_conflicts)
+            total += len(batch)
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: {total}')
+        return range(first, first + total)
+
+    def skewed(self, ids):
+        """Случайный id: первые в диапазоне выпадают заметно чаще.
+
+        P(индекс < x) = (x / n) ** (1 / skew) — при skew=3 на первый
+        процент строк приходится около пятой части выборок.
+        """
+        return ids[int(len(ids) * self.random.random() ** self.skew)]
+
+    def text(self, low, high):
+        return ' '.join(self.random.choices(
+            self.sentences, k=self.random.randint(low, high)))
+
+    def make_users(self, total):
+        first = next_id(User)
+        password = make_password(None)
+        for user_id in range(first, first + total):
+            yield User(
+                id=user_id,
+                username=f'{self.fake.user_name()}_{user_id}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+
+    def make_groups(self, total):
+        first = next_id(Group)
+        for group_id in range(first, first + total):
+            yield Group(
+                id=group_id,
+                title=self.fake.catch_phrase()[:200],
+                slug=f'group-{group_id}',
+                description=self.text(1, 3),
+            )
+
+    def make_posts(self, total, users, groups, days):
+        """Посты; их даты запоминаются для дат комментариев."""
+        self.post_dates = array('d')
+        if not users:
+            return
+        first = next_id(Post)
+        span = datetime.timedelta(days=days).total_seconds()
+        for post_id in range(first, first + total):
+            pub_date = self.now - datetime.timedelta(
+                seconds=self.random.random() * span)
+            self.post_dates.append(pub_date.timestamp())
+            group_id = None
+            if groups and self.random.random() >= NO_GROUP_SHARE:
+                group_id = self.skewed(groups)
+            author_id = self.skewed(users)
+            self.author_ids.add(author_id)
+            yield Post(
+                id=post_id,
+                text=self.text(1, 6),
+                pub_date=pub_date,
+                updated=pub_date,
+                author_id=author_id,
+                group_id=group_id,
+            )
+
+    def make_comments(self, total, users, posts):
+        if not posts or not users:
+            return
+        first = next_id(Comment)
+        now = self.now.timestamp()
+        for comment_id in range(first, first + total):
+            post_id = self.skewed(posts)
+            posted = self.post_dates[post_id - posts.start]
+            created = posted + self.random.random() * (now - posted)
+            yield Comment(
+                id=comment_id,
+                post_id=post_id,
+                author_id=self.random.choice(users),
+                text=self.text(1, 2),
+                created=datetime.datetime.fromtimestamp(
+                    created, tz=datetime.timezone.utc),
+            )
+
+    def make_follows(self, total, users):
+        """Подписки: у немногих авторов большинство подписчиков.
+
+        Повторные пары и подписки на себя пропускаются, поэтому подписок
+        может получиться немного меньше total.
+        """
+        if len(users) < 2:
+            return
+        for _ in range(total):
+            user_id = self.random.choice(users)
+            author_id = self.skewed(users)
+            if user_id != author_id:
+                self.reader_ids.add(user_id)
+                yield Follow(user_id=user_id, author_id=author_id)
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:21
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+search_index = import_module('posts.migrations.0013_post_search_index')
+
+# SQLite добавляет колонку пересозданием posts_post, а вместе со старой
+# таблицей пропадают и триггеры полнотекстового индекса: ставим их заново.
+TRIGGERS_SQL = search_index.DROP_SQL[:3] + search_index.CREATE_SQL[1:]
+
+
+def fill_updated(apps, schema_editor):
+    """Для старых постов время изменения — время публикации."""
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_auto_20261018_0218'),
+    ]
+
+    operations = [
+        # При откате колонка удаляется тоже пересозданием таблицы.
+        migrations.RunPython(migrations.RunPython.noop,
+                             search_index.run_on_sqlite(TRIGGERS_SQL)),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now,
+                verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_updated, migrations.RunPython.noop),
+        migrations.RunPython(search_index.run_on_sqlite(TRIGGERS_SQL),
+                             migrations.RunPython.noop),
+    ]
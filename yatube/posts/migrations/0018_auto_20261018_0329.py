@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_auto_20261018_0232'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagevariant',
+            name='format',
+            field=models.CharField(choices=[('JPEG', 'JPEG'), ('WEBP', 'WebP'), ('FAIL', 'Ошибка')], max_length=4, verbose_name='Формат'),
+        ),
+    ]
@@ -1,8 +1,27 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import post_image_storage
+
 User = get_user_model()
 
+# Колонки, которые нужны карточке поста в ленте.
+FEED_FIELDS = (
+    'text', 'pub_date', 'updated', 'image', 'comment_count',
+    'author', 'author__username', 'author__first_name', 'author__last_name',
+    'group', 'group__slug', 'group__title',
+)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа одним JOIN, без запроса на строку.
+
+        Варианты картинок подгружаются одним запросом на страницу.
+        """
+        return self.select_related('author', 'group').only(
+            *FEED_FIELDS).prefetch_related('variants')
+
 
 class Post(models.Model):
     text = models.TextField('Текст поста')
@@ -20,17 +39,43 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True
     )
+    comment_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты сортируются по (-pub_date, -id), id в индексах разводит
+        # посты с одинаковой датой без дополнительной сортировки.
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['pub_date', 'id'],
+                         name='post_pub_date_id_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text
 
+    def save(self, *args, **kwargs):
+        # comment_count меняется только через F() в posts.stats, поэтому
+        # при правке поста не перезаписываем его устаревшим значением.
+        if not self._state.adding and not kwargs.get('update_fields'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comment_count'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -67,6 +112,10 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -85,6 +134,99 @@ class Follow(models.Model):
                 fields=['author', 'user'],
                 name='unique_follower')
         ]
+        indexes = [
+            models.Index(fields=['user', 'author'],
+                         name='follow_user_author_idx'),
+        ]
 
     def str(self):
         return f"{self.author}, follower:{self.user}"
+
+
+class Profile(models.Model):
+    """Хранимые счётчики пользователя, чтобы не считать их на каждой странице.
+
+    Меняются сигналами через F(), расхождения чинит reconcile_counters.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                related_name='profile')
+    post_count = models.PositiveIntegerField('Постов', default=0)
+    follower_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return f'{self.user}: {self.post_count} постов'
+
+
+class FeedEntry(models.Model):
+    """Готовая лента подписок: пост автора, на которого подписан user.
+
+    Заполняется при публикации поста и при подписке, чистится при отписке,
+    поэтому страница ленты читается одним диапазоном индекса по user.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_idx'),
+        ]
+
+
+class ImageVariant(models.Model):
+    """Готовая копия картинки поста заданной ширины и формата для srcset.
+
+    Создаётся в фоне (posts.thumbnails) после загрузки картинки.
+    """
+    JPEG = 'JPEG'
+    WEBP = 'WEBP'
+    # Не вариант, а отметка: картинку поста разрезать не удалось.
+    FAILED = 'FAIL'
+    FORMATS = ((JPEG, 'JPEG'), (WEBP, 'WebP'), (FAILED, 'Ошибка'))
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='variants')
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    format = models.CharField('Формат', max_length=4, choices=FORMATS)
+    image = models.ImageField('Файл', upload_to='posts/variants/')
+
+    class Meta:
+        ordering = ('width',)
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'format', 'width'],
+                name='unique_image_variant')
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.width}w {self.format}'
+
+
+class MediaBlob(models.Model):
+    """Файл картинки в HashedStorage и число постов, которые на него
+    ссылаются."""
+    name = models.CharField('Файл', max_length=255, unique=True)
+    refcount = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
@@ -0,0 +1,120 @@
+"""Полнотекстовый поиск по постам через SQLite FTS5.
+
+Таблица posts_post_fts и триггеры синхронизации создаются миграцией 0013,
+для уже существующих данных есть команда rebuild_search_index. На других
+СУБД поиск откатывается к LIKE по тексту.
+"""
+import re
+from contextlib import contextmanager
+from importlib import import_module
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+INSERT_TRIGGER = 'posts_post_fts_insert'
+# Служебные символы, которыми FTS5 отмечает совпадения в сниппете;
+# в HTML они заменяются на <mark> уже после экранирования текста.
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_WORDS = 24
+# Порядок выдачи: сначала более релевантные (bm25 меньше — лучше).
+SEARCH_ORDERING = ('rank', 'id')
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def to_fts_query(text):
+    """Запрос пользователя в синтаксис FTS5: все слова, каждое в кавычках."""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def search_posts(text):
+    """Найденные посты для лент с аннотациями rank и snippet."""
+    fts_query = to_fts_query(text)
+    posts = Post.objects.for_feed()
+    if not fts_query or not fts_available():
+        posts = posts.annotate(
+            rank=RawSQL('0.0', ()), snippet=RawSQL('NULL', ()))
+        if not fts_query:
+            return posts.none()
+        return posts.filter(text__icontains=text)
+    return posts.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = posts_post.id',
+               f'{FTS_TABLE} MATCH %s'],
+        params=[fts_query],
+    ).annotate(
+        rank=RawSQL(f'bm25({FTS_TABLE})', ()),
+        snippet=RawSQL(
+            f"snippet({FTS_TABLE}, 0, %s, %s, '…', %s)",
+            (MARK_START, MARK_END, SNIPPET_WORDS)),
+    )
+
+
+def count_matches(text):
+    """Число найденных постов для ?page=N.
+
+    COUNT(*) по выборке search_posts SQLite не выполнит: bm25() и snippet()
+    работают только в запросе с MATCH по самой таблице FTS.
+    """
+    fts_query = to_fts_query(text)
+    if not fts_query:
+        return 0
+    if not fts_available():
+        return Post.objects.filter(text__icontains=text).count()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (fts_query,))
+        return cursor.fetchone()[0]
+
+
+def matching_ids(text):
+    """Подзапрос id найденных постов для фильтра pk__in (админка)."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (to_fts_query(text),))
+
+
+def highlight(snippet):
+    """Сниппет FTS в безопасный HTML с подсветкой совпадений."""
+    html = escape(snippet)
+    return mark_safe(
+        html.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def rebuild_index():
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+@contextmanager
+def deferred_index():
+    """Массовая вставка постов без построчного обновления индекса.
+
+    Триггер вставки снимается на время блока, а в конце возвращается,
+    и индекс перестраивается целиком — даже если блок упал.
+    """
+    if not fts_available():
+        yield
+        return
+    migration = import_module('posts.migrations.0013_post_search_index')
+    create_trigger = migration.CREATE_SQL[1]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {INSERT_TRIGGER}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(create_trigger)
+        rebuild_index()
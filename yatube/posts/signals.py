@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import blobs, counts, feed, generations, stats, timeline
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.bulk_create(
+            [Profile(user=instance)], ignore_conflicts=True)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    """Запоминаем прежние группу и картинку, чтобы перенести пост между
+    счётчиками."""
+    instance._old_group_id = None
+    instance._old_image = ''
+    if instance.pk:
+        instance._old_group_id, instance._old_image = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', 'image').first() or (
+            None, '')
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    old_group_id = getattr(instance, '_old_group_id', None)
+    generations.bump(*generations.post_scopes(
+        instance.author_id, instance.group_id, old_group_id,
+        post_id=instance.pk))
+    old_image = getattr(instance, '_old_image', '') or ''
+    if (instance.image.name or '') != old_image:
+        blobs.acquire(instance.image.name)
+        blobs.release(old_image)
+    if created:
+        counts.adjust(counts.post_keys(instance, instance.group_id), 1)
+        stats.bump_profile(instance.author_id, post_count=1)
+        feed.fan_out_post(instance)
+        timeline.push_post(instance)
+        return
+    if old_group_id != instance.group_id:
+        if old_group_id:
+            counts.adjust([counts.group_key(old_group_id)], -1)
+        if instance.group_id:
+            counts.adjust([counts.group_key(instance.group_id)], 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    generations.bump(*generations.post_scopes(
+        instance.author_id, instance.group_id, post_id=instance.pk))
+    counts.adjust(counts.post_keys(instance, instance.group_id), -1)
+    stats.bump_profile(instance.author_id, post_count=-1)
+    blobs.release(instance.image.name)
+    timeline.drop_post(instance)
+
+
+def bump_comment_generations(comment):
+    # Пост берём запросом: при каскадном удалении его уже может не быть.
+    post = Post.objects.filter(pk=comment.post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is None:
+        generations.bump(generations.ALL)
+    else:
+        generations.bump(*generations.post_scopes(
+            *post, post_id=comment.post_id))
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        stats.bump_comments(instance.post_id, 1)
+    bump_comment_generations(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    stats.bump_comments(instance.post_id, -1)
+    bump_comment_generations(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_generations(sender, instance, **kwargs):
+    # При удалении группы посты теряют её через UPDATE, без сигналов.
+    generations.bump(generations.ALL, generations.GROUPS,
+                     generations.group_scope(instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    generations.bump(generations.follow_scope(instance.author_id),
+                     generations.follow_scope(instance.user_id))
+    if created:
+        stats.bump_profile(instance.author_id, follower_count=1)
+        stats.bump_profile(instance.user_id, following_count=1)
+        feed.backfill_feed(instance.user_id, instance.author_id)
+        timeline.forget(instance.user_id)
+        timeline.refresh_celebrity(instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    generations.bump(generations.follow_scope(instance.author_id),
+                     generations.follow_scope(instance.user_id))
+    stats.bump_profile(instance.author_id, follower_count=-1)
+    stats.bump_profile(instance.user_id, following_count=-1)
+    feed.prune_feed(instance.user_id, instance.author_id)
+    timeline.forget(instance.user_id)
+    followers = timeline.refresh_celebrity(instance.author_id)
+    if followers == settings.TIMELINE_CELEBRITY_FOLLOWERS - 1:
+        feed.demote(instance.author_id)
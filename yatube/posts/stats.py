@@ -0,0 +1,63 @@
+"""Хранимые счётчики: комментарии поста и посты/подписки пользователя."""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, Profile, User
+
+
+def _count_of(queryset, field, outer):
+    """Подзапрос «сколько строк queryset ссылается на OuterRef(outer)»."""
+    counted = (queryset.filter(**{field: OuterRef(outer)}).order_by()
+               .values(field).annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def _profile_counts():
+    return {
+        'post_count': _count_of(Post.objects.all(), 'author', 'user'),
+        'follower_count': _count_of(Follow.objects.all(), 'author', 'user'),
+        'following_count': _count_of(Follow.objects.all(), 'user', 'user'),
+    }
+
+
+def get_profile(user_id):
+    """Профиль пользователя; если его нет, счётчики считаются по таблицам."""
+    profile = Profile.objects.filter(user_id=user_id).first()
+    if profile is None:
+        Profile.objects.bulk_create(
+            [Profile(user_id=user_id)], ignore_conflicts=True)
+        Profile.objects.filter(user_id=user_id).update(**_profile_counts())
+        profile = Profile.objects.get(user_id=user_id)
+    return profile
+
+
+def bump_profile(user_id, **deltas):
+    """Атомарно сдвигает счётчики профиля, например post_count=1."""
+    # Счётчики не уходят в минус, даже если успели разойтись с таблицами.
+    floors = {f'{field}__gte': -delta
+              for field, delta in deltas.items() if delta < 0}
+    updated = Profile.objects.filter(user_id=user_id, **floors).update(
+        **{field: F(field) + delta for field, delta in deltas.items()})
+    if not updated and not floors:
+        # Профиля не было: get_profile посчитает значения уже с новой строкой.
+        # При уменьшении профиль не создаём — пользователь может удаляться.
+        get_profile(user_id)
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id, comment_count__gte=-delta).update(
+        comment_count=F('comment_count') + delta)
+
+
+def reconcile():
+    """Пересчитывает все хранимые счётчики. Возвращает число профилей."""
+    Post.objects.update(
+        comment_count=_count_of(Comment.objects.all(), 'post', 'pk'))
+    missing = User.objects.filter(profile__isnull=True).values_list(
+        'pk', flat=True)
+    # Размер пакета выбирает Django: SQLite не принимает больше 500
+    # строк в одном INSERT.
+    Profile.objects.bulk_create(
+        [Profile(user_id=user_id) for user_id in list(missing)],
+        ignore_conflicts=True)
+    return Profile.objects.update(**_profile_counts())
@@ -0,0 +1,57 @@
+"""Хранилище картинок постов с именами по содержимому.
+
+Файл сохраняется под именем <каталог>/<2 символа>/<sha256><расширение>,
+поэтому одинаковые картинки лежат на диске один раз, а адрес файла
+никогда не меняет содержимого — его можно кэшировать навсегда. Сколько
+постов ссылается на файл, считает MediaBlob (см. posts.blobs).
+"""
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class HashedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяет содержимое: одинаковое имя — тот же файл.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        digest = content_hash(content)
+        name = os.path.join(
+            directory, digest[:2],
+            digest + os.path.splitext(filename)[1].lower())
+        if self.exists(name):
+            # Такая картинка уже загружена: не пишем её второй раз.
+            return name
+        # Файл пишется под временным именем и ставится на место жёсткой
+        # ссылкой. Если ту же картинку параллельно сохранил другой запрос,
+        # link получит FileExistsError — это тот же файл. Базовый _save на
+        # FileExistsError попросил бы новое имя у get_available_name и
+        # зациклился бы.
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        try:
+            os.link(self.path(temporary), self.path(name))
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(self.path(temporary))
+        return name
+
+
+post_image_storage = HashedStorage()
@@ -0,0 +1,11 @@
+from django import template
+
+from posts import cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Готовые карточки постов страницы, см. posts.cards."""
+    return cards.render_cards(posts)
@@ -0,0 +1,39 @@
+from django import template
+
+from posts import thumbnails
+from posts.models import ImageVariant
+
+register = template.Library()
+
+# Карточка занимает всю ширину экрана на телефонах и 960px на десктопе.
+CARD_SIZES = '(max-width: 992px) 100vw, 960px'
+
+
+@register.inclusion_tag('includes/picture.html')
+def post_picture(post, lazy=False):
+    """<picture> из готовых вариантов картинки поста.
+
+    Пока вариантов нет, выводит заглушку и ставит картинку в очередь.
+    Картинку с отметкой FAILED не выводит и в очередь не ставит.
+    """
+    variants = list(post.variants.all()) if post.image else []
+    if post.image and not variants:
+        thumbnails.submit(post.pk)
+    failed = any(
+        variant.format == ImageVariant.FAILED for variant in variants)
+    jpeg = [variant for variant in variants
+            if variant.format == ImageVariant.JPEG]
+    webp = [variant for variant in variants
+            if variant.format == ImageVariant.WEBP]
+    # В src — вариант под десктопную карточку или ближайший меньший.
+    fallback = ([variant for variant in jpeg if variant.width <= 960]
+                or jpeg)[-1:]
+    return {
+        'post': post,
+        'jpeg': jpeg,
+        'webp': webp,
+        'fallback': fallback[0] if fallback else None,
+        'failed': failed,
+        'sizes': CARD_SIZES,
+        'lazy': lazy,
+    }
@@ -0,0 +1,105 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def read_json(response):
+    return json.loads(b''.join(response.streaming_content))
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api_author')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='api-group',
+            description='Описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group)
+            for number in range(settings.API_PAGE_SIZE + 2)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_listings_follow_cursor(self):
+        """Ленты отдают JSON-страницы и ссылку на следующую страницу."""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list',
+                    kwargs={'slug': self.group.slug}),
+            reverse('posts:api_profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:api_follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                data = read_json(response)
+                self.assertEqual(len(data['results']), settings.API_PAGE_SIZE)
+                first = data['results'][0]
+                self.assertEqual(first['id'], self.posts[-1].pk)
+                self.assertEqual(first['author'], self.author.username)
+                self.assertEqual(first['group'], self.group.slug)
+                rest = read_json(self.reader_client.get(data['next']))
+                self.assertEqual(
+                    [item['id'] for item in rest['results']],
+                    [self.posts[1].pk, self.posts[0].pk])
+                self.assertIsNone(rest['next'])
+
+    def test_fields_projection(self):
+        """fields= оставляет только запрошенные поля и идёт в ссылку next."""
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,text'})
+        data = read_json(response)
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        self.assertIn('fields=id%2Ctext', data['next'])
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_follow_requires_login(self):
+        """Лента подписок без входа отвечает 401."""
+        response = self.client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_post_detail_with_comments(self):
+        """Пост отдаётся вместе со страницей комментариев."""
+        post = self.posts[0]
+        response = self.client.get(
+            reverse('posts:api_post_detail', kwargs={'post_id': post.pk}),
+            {'fields': 'text,comment_count'})
+        data = read_json(response)
+        self.assertEqual(data['post'], {'text': post.text, 'comment_count': 1})
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+        self.assertEqual(data['results'][0]['author'], self.reader.username)
+        response = self.client.get(
+            reverse('posts:api_post_detail', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get(self):
+        """Повторный запрос с ETag получает 304."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
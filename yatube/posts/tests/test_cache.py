@@ -0,0 +1,197 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import generations
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='cached_author')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='cached',
+            description='Описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Первый пост', author=self.author, group=self.group)
+
+    def test_new_post_shows_up_at_once(self):
+        """Новый пост сразу виден на главной, группе и в профиле."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+        )
+        for url in urls:
+            self.client.get(url)
+        Post.objects.create(
+            text='Свежий пост', author=self.author, group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_fragment_survives_direct_update(self):
+        """Без сигналов поколение не меняется и фрагмент берётся из кэша."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        self.assertContains(self.client.get(url), 'Первый пост')
+
+    def test_scoped_generations(self):
+        """Комментарий и группа сдвигают только свои области."""
+        other = User.objects.create_user(username='other_author')
+        before = {
+            scope: generations.get(scope)
+            for scope in (generations.ALL,
+                          generations.group_scope(self.group.pk),
+                          generations.author_scope(other.pk))
+        }
+        Comment.objects.create(
+            post=self.post, author=other, text='Комментарий')
+        after = {scope: generations.get(scope) for scope in before}
+        self.assertNotEqual(before[generations.ALL], after[generations.ALL])
+        self.assertNotEqual(before[generations.group_scope(self.group.pk)],
+                            after[generations.group_scope(self.group.pk)])
+        self.assertEqual(before[generations.author_scope(other.pk)],
+                         after[generations.author_scope(other.pk)])
+        groups = generations.get(generations.GROUPS)
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertNotEqual(groups, generations.get(generations.GROUPS))
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='page_author')
+        cls.reader = User.objects.create_user(username='page_reader')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(text='Пост', author=self.author)
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный анонимный запрос не идёт в шаблоны и базу постов."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        first = self.client.get(url)
+        self.assertIsNotNone(first.context)
+        second = self.client.get(url)
+        self.assertIsNone(second.context)
+        self.assertIn('Cookie', second['Vary'])
+        self.assertIn('public', second['Cache-Control'])
+        self.assertEqual(first.content, second.content)
+
+    def test_signals_invalidate_pages(self):
+        """Комментарий и подписка сбрасывают страницы, где они видны."""
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        profile = reverse('posts:profile',
+                          kwargs={'username': self.author.username})
+        self.client.get(detail)
+        self.client.get(profile)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Свежий комментарий')
+        self.assertContains(self.client.get(detail), 'Свежий комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.client.get(profile), 'Подписчиков: 1')
+
+    def test_authorized_pages_are_private(self):
+        """Авторизованным страница не кэшируется и помечена private."""
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIsNotNone(self.client.get(reverse('posts:index')).context)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etag_author')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        self.detail = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def test_matching_etag_gets_304(self):
+        """Повторный запрос с ETag получает 304 без шаблонов."""
+        for url in (reverse('posts:index'), self.detail):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                again = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(again.status_code, 304)
+                self.assertIsNone(again.context)
+
+    def test_changes_update_validators(self):
+        """Правка поста и новый комментарий меняют ETag страницы поста."""
+        etag = self.client.get(self.detail)['ETag']
+        self.post.text = 'Правка'
+        self.post.save()
+        edited = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(edited.status_code, 200)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        commented = self.client.get(
+            self.detail, HTTP_IF_NONE_MATCH=edited['ETag'])
+        self.assertEqual(commented.status_code, 200)
+        self.assertNotEqual(commented['ETag'], edited['ETag'])
+
+    def test_if_modified_since_sees_edits_and_deletions(self):
+        """Правка поста и удаление комментария сдвигают Last-Modified.
+
+        Даты в таблицах после них не меняются, поэтому время берётся из
+        поколений.
+        """
+        comment = Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        urls = (reverse('posts:index'), self.detail)
+        later = time.time_ns() // 1000
+
+        def change(action):
+            nonlocal later
+            seen = {url: self.client.get(url)['Last-Modified']
+                    for url in urls}
+            later += 2 * 10 ** 6
+            with mock.patch.object(
+                    generations, '_initial', return_value=later):
+                action()
+            return seen
+
+        def edit():
+            self.post.text = 'Правка'
+            self.post.save()
+
+        for action in (edit, comment.delete):
+            seen = change(action)
+            for url in urls:
+                with self.subTest(url=url, action=action.__name__):
+                    response = self.client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=seen[url])
+                    self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Авторизованный пользователь не получает ETag анонима."""
+        etag = self.client.get(reverse('posts:index'))['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('posts:index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
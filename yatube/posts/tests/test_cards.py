@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import cards, thumbnails
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class PostCardsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='card_author')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='cards',
+            description='Описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Карточка {number}', author=cls.author,
+                group=cls.group)
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def page_posts(self):
+        return Post.objects.for_feed().order_by('-pub_date', '-id')
+
+    def count_renders(self, posts=None):
+        with mock.patch.object(
+                cards, 'render_to_string',
+                wraps=render_to_string) as render:
+            html = cards.render_cards(posts or self.page_posts())
+        return render.call_count, html
+
+    def test_cards_are_cached(self):
+        """Повторно карточки берутся из кэша одним get_many."""
+        renders, html = self.count_renders()
+        self.assertEqual(renders, len(self.posts))
+        self.assertIn('Карточка 2', html[0])
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many:
+            renders, again = self.count_renders()
+        self.assertEqual(renders, 0)
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(html, again)
+
+    def test_cards_are_shared_between_listings(self):
+        """Карточки с главной переиспользуются на странице группы."""
+        self.client.get(reverse('posts:index'))
+        with mock.patch.object(
+                cards, 'render_to_string',
+                wraps=render_to_string) as render:
+            response = self.client.get(
+                reverse('posts:group_list', kwargs={'slug': 'cards'}))
+        self.assertEqual(render.call_count, 0)
+        self.assertContains(response, 'Карточка 1')
+
+    def test_changes_invalidate_only_their_card(self):
+        """Комментарий, правка и перенос поста обновляют одну карточку."""
+        self.count_renders()
+        first, second, third = self.posts
+        Comment.objects.create(post=first, author=self.author, text='Да')
+        renders, html = self.count_renders()
+        self.assertEqual(renders, 1)
+        self.assertIn('Комментариев: 1', html[-1])
+        second.text = 'Исправленная карточка'
+        second.save()
+        renders, html = self.count_renders()
+        self.assertEqual(renders, 1)
+        self.assertIn('Исправленная карточка', html[1])
+        third.group = None
+        third.save()
+        renders, html = self.count_renders()
+        self.assertEqual(renders, 1)
+        self.assertNotIn('Все записи группы', html[0])
+
+    def test_placeholder_cards_are_not_cached(self):
+        """Карточка с картинкой без вариантов рендерится каждый раз."""
+        Post.objects.filter(pk=self.posts[0].pk).update(image='posts/x.gif')
+        with mock.patch.object(thumbnails, 'submit') as submit:
+            self.count_renders()
+            renders, _ = self.count_renders()
+        self.assertEqual(renders, 1)
+        self.assertEqual(submit.call_count, 2)
@@ -0,0 +1,135 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import counts, stats
+from posts.models import Comment, Follow, Group, Post, Profile
+
+User = get_user_model()
+
+
+class PostCountsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='counted_author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='counted',
+            description='Описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other',
+            description='Описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group)
+
+    def group_count(self, group):
+        return counts.get_count(counts.group_key(group.pk), group.posts.all())
+
+    def test_signals_update_cached_counts(self):
+        """Создание, перенос и удаление поста меняют счётчики в кэше."""
+        self.assertEqual(self.group_count(self.group), 1)
+        self.assertEqual(
+            counts.get_count(counts.ALL_KEY, Post.objects.all()), 1)
+        Post.objects.create(text='Ещё', author=self.author, group=self.group)
+        self.assertEqual(self.group_count(self.group), 2)
+        self.assertEqual(cache.get(counts.ALL_KEY), 2)
+        self.assertEqual(self.group_count(self.other_group), 0)
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertEqual(cache.get(counts.group_key(self.group.pk)), 1)
+        self.assertEqual(cache.get(counts.group_key(self.other_group.pk)), 1)
+        self.post.delete()
+        self.assertEqual(cache.get(counts.group_key(self.other_group.pk)), 0)
+        self.assertEqual(cache.get(counts.ALL_KEY), 1)
+
+    def test_feed_count_and_recount(self):
+        """Лента подписок считается по авторам, recount_all чинит дрейф."""
+        self.assertEqual(counts.get_feed_count(self.reader), 1)
+        cache.set(counts.author_key(self.author.pk), 100)
+        self.assertEqual(counts.get_feed_count(self.reader), 100)
+        counts.recount_all()
+        self.assertEqual(counts.get_feed_count(self.reader), 1)
+        self.assertEqual(cache.get(counts.author_key(self.reader.pk)), 0)
+
+    def test_counted_pages_skip_count_query(self):
+        """?page=N берёт число постов из кэша, а не из COUNT(*)."""
+        cache.set(counts.ALL_KEY, 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/?page=1')
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertFalse(
+            [query for query in queries if 'COUNT(*)' in query['sql']])
+
+
+class StoredCountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='stored_author')
+        cls.reader = User.objects.create_user(username='stored_reader')
+
+    def setUp(self):
+        self.post = Post.objects.create(text='Пост', author=self.author)
+
+    def test_comment_and_post_counters(self):
+        """Комментарии и посты меняют хранимые счётчики."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        self.post.text = 'Правка'
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+        self.assertEqual(stats.get_profile(self.author.pk).post_count, 1)
+        Post.objects.create(text='Второй', author=self.author)
+        self.assertEqual(stats.get_profile(self.author.pk).post_count, 2)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(stats.get_profile(self.author.pk).follower_count, 1)
+        self.assertEqual(stats.get_profile(self.reader.pk).following_count, 1)
+        follow.delete()
+        self.assertEqual(stats.get_profile(self.author.pk).follower_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        """reconcile_counters возвращает счётчики к данным таблиц."""
+        Profile.objects.filter(user=self.author).update(post_count=42)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(stats.get_profile(self.author.pk).post_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_reconcile_creates_many_profiles(self):
+        """reconcile создаёт профили больше чем для 500 пользователей.
+
+        SQLite не принимает INSERT больше чем из 500 строк.
+        """
+        User.objects.bulk_create(
+            [User(username=f'bulk_{number}') for number in range(600)])
+        self.assertEqual(stats.reconcile(), User.objects.count())
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+
+    def test_post_detail_uses_stored_count(self):
+        """post_detail показывает число постов автора из профиля."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(response.context['author_posts'], 1)
@@ -0,0 +1,339 @@
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts import counts, dump, stats
+from posts.models import Comment, FeedEntry, Follow, Group, MediaBlob, Post
+from posts.search import search_posts
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='dump_author')
+        cls.reader = User.objects.create_user(username='dump_reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='dump-group',
+            description='Описание',
+        )
+        cls.posts = [
+            Post.objects.create(text=f'Пост {number}', author=cls.author,
+                                group=cls.group if number % 2 else None)
+            for number in range(5)
+        ]
+        Post.objects.filter(pk=cls.posts[0].pk).update(
+            pub_date=timezone.now() - datetime.timedelta(days=30))
+        Comment.objects.create(
+            post=cls.posts[1], author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def export(self, *args):
+        call_command('export_yatube', self.directory, *args,
+                     stdout=StringIO())
+
+    def read(self, table, fmt='jsonl', compress=False):
+        path = dump.dump_path(self.directory, table, fmt, compress)
+        with dump.open_dump(path) as file:
+            return list(dump.read_rows(file, fmt))
+
+    def test_export_jsonl(self):
+        """Все таблицы выгружаются в JSONL с именами вместо id."""
+        self.export()
+        posts = self.read('posts')
+        self.assertEqual([row['id'] for row in posts],
+                         [post.pk for post in self.posts])
+        self.assertEqual(posts[1]['author'], self.author.username)
+        self.assertEqual(posts[1]['group'], self.group.slug)
+        self.assertIsNone(posts[0]['group'])
+        pub_date = Post.objects.get(pk=posts[1]['id']).pub_date
+        self.assertEqual(posts[1]['pub_date'], pub_date.isoformat())
+        self.assertEqual(self.read('comments')[0]['post'], self.posts[1].pk)
+        self.assertEqual(self.read('follows'), [{
+            'id': Follow.objects.get().pk,
+            'user': self.reader.username,
+            'author': self.author.username,
+        }])
+        self.assertEqual(self.read('groups')[0]['slug'], self.group.slug)
+
+    def test_export_gzip_csv(self):
+        """CSV сжимается gzip и читается обратно."""
+        self.export('--format', 'csv', '--gzip', '--tables', 'posts')
+        path = dump.dump_path(self.directory, 'posts', 'csv', True)
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            self.assertTrue(file.readline().startswith('id,text,'))
+        rows = self.read('posts', 'csv', True)
+        self.assertEqual(len(rows), len(self.posts))
+        self.assertIsNone(rows[0]['group'])
+        self.assertFalse(os.path.exists(
+            dump.dump_path(self.directory, 'comments', 'csv', True)))
+
+    def test_filters(self):
+        """Фильтры по дате, группе и автору."""
+        since = (timezone.now() - datetime.timedelta(days=1)).date()
+        self.export('--tables', 'posts', '--since', since.isoformat(),
+                    '--group', self.group.slug)
+        self.assertEqual([row['id'] for row in self.read('posts')],
+                         [self.posts[1].pk, self.posts[3].pk])
+        self.export('--author', self.reader.username)
+        self.assertEqual(self.read('posts'), [])
+        self.assertEqual(len(self.read('comments')), 1)
+
+    def test_resume_from_cursor(self):
+        """--after дописывает строки после курсора в тот же файл."""
+        self.export('--tables', 'posts', '--until', self.posts[2].pub_date
+                    .isoformat())
+        written = self.read('posts')
+        output = StringIO()
+        call_command('export_yatube', self.directory, '--tables', 'posts',
+                     '--after', str(written[-1]['id']), stdout=output)
+        self.assertIn(f'--after posts={self.posts[-1].pk}',
+                      output.getvalue())
+        path = dump.dump_path(self.directory, 'posts', 'jsonl')
+        with open(path, encoding='utf-8') as file:
+            ids = [json.loads(line)['id'] for line in file]
+        self.assertEqual(ids, [post.pk for post in self.posts])
+
+    def test_cursor_is_per_table(self):
+        """Курсор одной таблицы не отрезает строки других."""
+        self.export('--tables', 'posts', '--until', self.posts[2].pub_date
+                    .isoformat())
+        self.export('--tables', 'posts', 'comments',
+                    '--after', f'posts={self.read("posts")[-1]["id"]}')
+        self.assertEqual([row['id'] for row in self.read('posts')],
+                         [post.pk for post in self.posts])
+        self.assertEqual(len(self.read('comments')), 1)
+        with self.assertRaises(CommandError):
+            self.export('--tables', 'posts', 'comments', '--after', '1')
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='import_author')
+        cls.reader = User.objects.create_user(username='import_reader')
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, table, rows, fmt='jsonl'):
+        path = dump.dump_path(self.directory, table, fmt)
+        names = list(dump.TABLES[table][1])
+        with dump.open_dump(path, 'w') as file:
+            dump.write_rows(file, fmt, names, rows)
+
+    def test_round_trip(self):
+        """Выгрузка загружается обратно с датами, счётчиками и лентой."""
+        group = Group.objects.create(
+            title='Группа', slug='import-group', description='Описание')
+        post = Post.objects.create(
+            text='Уникальныйтекст', author=self.author, group=group)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=timezone.now() - datetime.timedelta(days=3))
+        post.refresh_from_db()
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        Follow.objects.create(user=self.reader, author=self.author)
+        call_command('export_yatube', self.directory, '--format', 'csv',
+                     stdout=StringIO())
+        Follow.objects.all().delete()
+        Post.objects.all().delete()
+        group.delete()
+        call_command('import_yatube', self.directory, '--batch-size', '1',
+                     stdout=StringIO())
+        imported = Post.objects.get(pk=post.pk)
+        self.assertEqual(imported.pub_date, post.pub_date)
+        self.assertEqual(imported.updated, post.pub_date)
+        self.assertEqual(imported.group.slug, group.slug)
+        self.assertEqual(imported.comment_count, 1)
+        self.assertEqual(stats.get_profile(self.author.pk).post_count, 1)
+        self.assertEqual(
+            stats.get_profile(self.author.pk).follower_count, 1)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(
+            counts.get_count(counts.ALL_KEY, Post.objects.all()), 1)
+        self.assertEqual(list(search_posts('Уникальныйтекст')), [imported])
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertGreater(new_post.pk, post.pk)
+        # Триггер индекса после загрузки снова на месте.
+        self.assertEqual(list(search_posts('Новый')), [new_post])
+
+    def test_import_is_idempotent(self):
+        """Повторная загрузка не дублирует строки."""
+        pub_date = timezone.now().isoformat()
+        self.write('posts', [{
+            'id': 1000, 'text': 'Пост', 'pub_date': pub_date,
+            'author': 'new_author', 'group': None, 'image': '',
+        }])
+        self.write('follows', [
+            {'id': 1, 'user': self.reader.username, 'author': 'new_author'},
+            {'id': 2, 'user': 'new_author', 'author': 'new_author'},
+        ])
+        for _ in range(2):
+            call_command('import_yatube', self.directory, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        author = User.objects.get(username='new_author')
+        self.assertFalse(author.has_usable_password())
+        self.assertEqual(Post.objects.get().author, author)
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_colliding_ids_are_remapped(self):
+        """Занятый чужим постом id заменяется, комментарии идут за постом."""
+        local = Post.objects.create(text='Местный', author=self.author)
+        Comment.objects.create(post=local, author=self.author, text='Свой')
+        pub_date = timezone.now().isoformat()
+        self.write('posts', [{
+            'id': local.pk, 'text': 'Из выгрузки', 'pub_date': pub_date,
+            'author': self.reader.username, 'group': None, 'image': '',
+        }])
+        self.write('comments', [
+            {'id': 1, 'post': local.pk, 'author': self.author.username,
+             'text': 'Ответ', 'created': pub_date},
+            {'id': 2, 'post': local.pk + 100, 'author': self.author.username,
+             'text': 'Без поста', 'created': pub_date},
+        ])
+        output = StringIO()
+        call_command('import_yatube', self.directory, stdout=output)
+        imported = Post.objects.get(text='Из выгрузки')
+        self.assertNotEqual(imported.pk, local.pk)
+        self.assertEqual(
+            list(imported.comments.values_list('text', flat=True)),
+            ['Ответ'])
+        self.assertEqual(
+            list(local.comments.values_list('text', flat=True)), ['Свой'])
+        self.assertIn('posts: прочитано строк 1, пропущено 0, с новым id 1',
+                      output.getvalue())
+        self.assertIn('comments: прочитано строк 2, пропущено 1, '
+                      'с новым id 1', output.getvalue())
+        output = StringIO()
+        call_command('import_yatube', self.directory, stdout=output)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_comments_need_posts(self):
+        """Комментарии без постов выгрузки не загружаются."""
+        self.write('comments', [])
+        with self.assertRaises(CommandError):
+            call_command('import_yatube', self.directory, stdout=StringIO())
+
+    def test_images_from_media_directory(self):
+        """Картинки из --media сохраняются в хранилище постов."""
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        os.makedirs(os.path.join(media, 'posts'))
+        with open(os.path.join(media, 'posts', 'old.gif'), 'wb') as file:
+            file.write(SMALL_GIF)
+        pub_date = timezone.now().isoformat()
+        self.write('posts', [
+            {'id': 1, 'text': 'С картинкой', 'pub_date': pub_date,
+             'author': self.author.username, 'group': None,
+             'image': 'posts/old.gif'},
+            {'id': 2, 'text': 'Без файла', 'pub_date': pub_date,
+             'author': self.author.username, 'group': None,
+             'image': 'posts/lost.gif'},
+        ])
+        with override_settings(MEDIA_ROOT=media):
+            output = StringIO()
+            call_command('import_yatube', self.directory, '--media', media,
+                         stdout=output)
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        self.assertEqual(Post.objects.get(pk=1).image.name,
+                         f'posts/{digest[:2]}/{digest}.gif')
+        self.assertEqual(Post.objects.get(pk=2).image.name, '')
+        self.assertIn('Картинок не найдено в --media: 1', output.getvalue())
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+
+
+class SeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, seed=1):
+        call_command('seed_yatube', '--users', '30', '--groups', '3',
+                     '--posts', '200', '--comments', '300', '--follows',
+                     '100', '--seed', str(seed), '--batch-size', '64',
+                     stdout=StringIO())
+
+    def test_seed_creates_skewed_data(self):
+        """Генератор создаёт строки с перекосом и производные данные."""
+        self.seed()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        per_author = sorted(
+            stats.get_profile(user.pk).post_count
+            for user in User.objects.all())
+        self.assertEqual(sum(per_author), 200)
+        self.assertGreater(per_author[-1], 4 * per_author[15])
+        post = Post.objects.order_by('-comment_count').first()
+        self.assertEqual(post.comment_count, post.comments.count())
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists())
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertGreater(len(set(dates)), 190)
+        follow = Follow.objects.filter(author__posts__isnull=False).first()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=follow.user, post__author=follow.author).exists())
+
+    def test_seed_is_reproducible(self):
+        """Одинаковый seed даёт одинаковые данные."""
+        self.seed()
+        first = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date'))[:20]
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed()
+        again = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date'))[:20]
+        self.assertEqual(first, again)
+
+    def test_seed_many_users(self):
+        """Больше 500 пользователей: пакетные вставки не упираются в лимиты
+        SQLite."""
+        call_command('seed_yatube', '--users', '600', '--groups', '2',
+                     '--posts', '50', '--comments', '50', '--follows',
+                     '700', '--now', '2024-05-01T00:00:00+00:00',
+                     stdout=StringIO())
+        self.assertEqual(User.objects.count(), 600)
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+        self.assertEqual(
+            Post.objects.latest('pub_date').pub_date.year, 2024)
+        self.assertEqual(
+            FeedEntry.objects.count(),
+            Follow.objects.filter(author__posts__isnull=False).values_list(
+                'user', 'author__posts').distinct().count())
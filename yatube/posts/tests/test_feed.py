@@ -0,0 +1,189 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import maintenance, timeline
+from posts.models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class FeedEntryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.reader = User.objects.create_user(username='feed_reader')
+
+    def setUp(self):
+        cache.clear()
+        self.old_post = Post.objects.create(text='Старый', author=self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_ids(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.id for post in response.context['page_obj']]
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дополняет ленту постами автора, отписка их убирает."""
+        self.reader_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}))
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленту подписчика сверху."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        author_client = Client()
+        author_client.force_login(self.author)
+        author_client.post(reverse('posts:post_create'),
+                           data={'text': 'Новый'})
+        new_post = Post.objects.get(text='Новый')
+        entry = FeedEntry.objects.get(user=self.reader, post=new_post)
+        self.assertEqual(entry.pub_date, new_post.pub_date)
+        self.assertEqual(self.feed_ids(), [new_post.id, self.old_post.id])
+
+    def test_backfill_is_capped(self):
+        """Подписка и пересчёт раскладывают только последние посты."""
+        Post.objects.bulk_create(
+            [Post(text=f'Пост {number}', author=self.author)
+             for number in range(5)])
+        newest = list(Post.objects.filter(author=self.author).order_by(
+            '-pub_date', '-id').values_list('id', flat=True)[:3])
+        with self.settings(TIMELINE_LENGTH=3):
+            Follow.objects.create(user=self.reader, author=self.author)
+            self.assertCountEqual(
+                FeedEntry.objects.filter(user=self.reader).values_list(
+                    'post', flat=True), newest)
+            FeedEntry.objects.filter(post=newest[0]).delete()
+            maintenance.rebuild_derived(user_ids=[self.reader.pk])
+        self.assertCountEqual(
+            FeedEntry.objects.filter(user=self.reader).values_list(
+                'post', flat=True), newest)
+
+    def test_history_past_backfill(self):
+        """Посты старше подписки, которых нет в FeedEntry, доступны и по
+        курсору, и по ?page=N, а число страниц сходится с постами."""
+        Post.objects.bulk_create(
+            [Post(text=f'Пост {number}', author=self.author)
+             for number in range(7)])
+        expected = list(Post.objects.filter(author=self.author).order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+        url = reverse('posts:follow_index')
+        with self.settings(TIMELINE_LENGTH=5, SAMPLING=3):
+            Follow.objects.create(user=self.reader, author=self.author)
+            self.assertEqual(
+                FeedEntry.objects.filter(user=self.reader).count(), 5)
+            walked, params = [], {}
+            while True:
+                page_obj = self.reader_client.get(
+                    url, params).context['page_obj']
+                walked += [post.id for post in page_obj]
+                if not page_obj.has_next():
+                    break
+                params = {'before': page_obj.next_cursor}
+            self.assertEqual(walked, expected)
+            numbered = []
+            for number in (1, 2, 3):
+                page_obj = self.reader_client.get(
+                    url, {'page': number}).context['page_obj']
+                self.assertEqual(page_obj.paginator.num_pages, 3)
+                numbered += [post.id for post in page_obj]
+        self.assertEqual(numbered, expected)
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='regular')
+        cls.star = User.objects.create_user(username='star')
+        cls.reader = User.objects.create_user(username='timeline_reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.star)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_push_and_pull(self):
+        """Обычный автор пишет в ленту, посты «звезды» подмешиваются."""
+        with self.settings(TIMELINE_CELEBRITY_FOLLOWERS=1):
+            timeline.read_timeline(self.reader.pk)
+            cache.set(timeline.celebrity_key(self.author.pk), False)
+            regular_post = Post.objects.create(text='1', author=self.author)
+            star_post = Post.objects.create(text='2', author=self.star)
+            stored = cache.get(timeline.timeline_key(self.reader.pk))
+            self.assertEqual([post_id for _, post_id in stored],
+                             [regular_post.id])
+            entries, complete = timeline.read_timeline(self.reader.pk)
+        self.assertTrue(complete)
+        self.assertEqual([post_id for _, post_id in entries],
+                         [star_post.id, regular_post.id])
+
+    def test_deep_pages_merge_celebrities(self):
+        """Страницы глубже кэша читаются из Post вместе с постами «звезды»,
+        в обе стороны."""
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:follow_index')
+        with self.settings(TIMELINE_CELEBRITY_FOLLOWERS=1,
+                           TIMELINE_LENGTH=settings.SAMPLING):
+            cache.set(timeline.celebrity_key(self.author.pk), False)
+            star_post = Post.objects.create(text='Звезда', author=self.star)
+            for number in range(settings.SAMPLING + 2):
+                Post.objects.create(text=str(number), author=self.author)
+            self.assertFalse(FeedEntry.objects.filter(
+                post=star_post).exists())
+            first_page = client.get(url).context['page_obj']
+            self.assertEqual(len(first_page), settings.SAMPLING)
+            second_page = client.get(
+                f'{url}?before={first_page.next_cursor}'
+            ).context['page_obj']
+            self.assertEqual(len(second_page), 3)
+            self.assertEqual(second_page[2].id, star_post.id)
+            self.assertFalse(second_page.has_next())
+            back = client.get(
+                f'{url}?after={second_page.previous_cursor}'
+            ).context['page_obj']
+        self.assertEqual([post.id for post in back],
+                         [post.id for post in first_page])
+
+    def test_celebrity_only_numbered_pages(self):
+        """?page=N показывает посты «звезды» так же, как курсорный режим."""
+        fan = User.objects.create_user(username='fan')
+        with self.settings(TIMELINE_CELEBRITY_FOLLOWERS=1):
+            Follow.objects.create(user=fan, author=self.star)
+            star_post = Post.objects.create(text='Звезда', author=self.star)
+            self.assertFalse(FeedEntry.objects.filter(
+                post=star_post).exists())
+            client = Client()
+            client.force_login(fan)
+            page_obj = client.get(reverse('posts:follow_index'),
+                                  {'page': 1}).context['page_obj']
+        self.assertEqual([post.id for post in page_obj], [star_post.id])
+        self.assertEqual(page_obj.paginator.num_pages, 1)
+
+    def test_demoted_celebrity_stays_in_feeds(self):
+        """Автор, переставший быть «звездой», не пропадает из лент."""
+        fan = User.objects.create_user(username='fan')
+        with self.settings(TIMELINE_CELEBRITY_FOLLOWERS=2):
+            Follow.objects.create(user=fan, author=self.star)
+            star_post = Post.objects.create(text='Звезда', author=self.star)
+            self.assertEqual(
+                [post_id for _, post_id in
+                 timeline.read_timeline(fan.pk)[0]], [star_post.id])
+            Follow.objects.filter(user=self.reader, author=self.star).delete()
+            self.assertTrue(FeedEntry.objects.filter(
+                user=fan, post=star_post).exists())
+            entries, _ = timeline.read_timeline(fan.pk)
+        self.assertEqual([post_id for _, post_id in entries], [star_post.id])
@@ -0,0 +1,96 @@
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+def read_xml(response):
+    return ElementTree.fromstring(b''.join(response.streaming_content))
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='feed-group',
+            description='Описание',
+        )
+        cls.other = Post.objects.create(text='Без группы', author=cls.author)
+        cls.post = Post.objects.create(
+            text='Пост <с разметкой> & символами', author=cls.author,
+            group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rss_feeds(self):
+        """RSS сайта, группы и автора содержат их посты."""
+        cases = (
+            (reverse('posts:rss'), 2),
+            (reverse('posts:group_rss', args=[self.group.slug]), 1),
+            (reverse('posts:profile_rss', args=[self.author.username]), 2),
+        )
+        for url, total in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(
+                    response['Content-Type'].startswith(
+                        'application/rss+xml'))
+                items = read_xml(response).findall('channel/item')
+                self.assertEqual(len(items), total)
+                self.assertEqual(items[0].findtext('description'),
+                                 self.post.text)
+                self.assertTrue(items[0].findtext('link').endswith(
+                    reverse('posts:post_detail', args=[self.post.pk])))
+
+    def test_atom_feed(self):
+        """Atom-лента группы: записи с автором и категорией."""
+        response = self.client.get(
+            reverse('posts:group_atom', args=[self.group.slug]))
+        entries = read_xml(response).findall(f'{ATOM}entry')
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(
+            entries[0].findtext(f'{ATOM}author/{ATOM}name'),
+            self.author.username)
+        self.assertEqual(
+            entries[0].find(f'{ATOM}category').get('term'), self.group.title)
+
+    @override_settings(FEED_ITEMS=2, FEED_CHUNK_SIZE=1)
+    def test_feed_is_streamed_in_chunks(self):
+        """Лента ограничена FEED_ITEMS и читается порциями."""
+        Post.objects.create(text='Третий', author=self.author)
+        response = self.client.get(reverse('posts:rss'))
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as queries:
+            items = read_xml(response).findall('channel/item')
+        self.assertEqual(len(items), settings.FEED_ITEMS)
+        self.assertEqual(len(queries), 1)
+
+    def test_conditional_get_and_cache_control(self):
+        """Повторный опрос с ETag получает 304, ответ кэшируется ненадолго."""
+        url = reverse('posts:atom')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn(f'max-age={settings.FEED_MAX_AGE}',
+                      response['Cache-Control'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unknown_group_feed(self):
+        """Лента несуществующей группы — 404."""
+        response = self.client.get(reverse('posts:group_rss', args=['none']))
+        self.assertEqual(response.status_code, 404)
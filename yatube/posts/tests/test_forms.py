@@ -1,13 +1,17 @@
+import hashlib
 import shutil
+import struct
 import tempfile
 
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.models import Comment, Group, Post
 
@@ -104,10 +108,12 @@ class PostFormTest(TestCase):
         self.assertEqual(Post.objects.count(), post_count + 1)
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertEqual(Post.objects.latest('id').text, context['text'])
+        # Картинка хранится под именем по своему содержимому (sha256).
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text='Текстовый текст',
-                image='posts/small_for_create.gif'
+                image=f'posts/{digest[:2]}/{digest}.gif'
             ).first()
         )
         # self.assertTrue(
@@ -211,3 +217,87 @@ class PostFormTest(TestCase):
             response,
             reverse('posts:post_detail', args=[self.post.id])
         )
+
+
+def make_jpeg(size):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(200, 30, 30)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(
+        name='photo.jpg', content=buffer.getvalue(),
+        content_type='image/jpeg')
+
+
+def make_mpo(size):
+    """Два кадра JPEG с индексом MPF в APP2, как у снимков камер."""
+    first, second = (make_jpeg(size).read() for _ in range(2))
+    ifd = b''.join((
+        struct.pack('>H', 3),
+        struct.pack('>HHI4s', 0xB000, 7, 4, b'0100'),
+        struct.pack('>HHII', 0xB001, 4, 1, 2),
+        struct.pack('>HHII', 0xB002, 7, 32, 50),
+        struct.pack('>I', 0),
+    ))
+    # SOI, маркер и длина APP2, 'MPF\0', заголовок TIFF, IFD и две записи.
+    header = 2 + 2 + 2 + 4 + 8 + len(ifd) + 32
+    entries = (
+        struct.pack('>IIIHH', 0x20030000, len(first) + header - 2, 0, 0, 0)
+        + struct.pack('>IIIHH', 0, len(second),
+                      header + len(first) - 2 - 10, 0, 0))
+    tiff = b'MM\x00\x2a' + struct.pack('>I', 8) + ifd + entries
+    app2 = (b'\xff\xe2' + struct.pack('>H', 2 + 4 + len(tiff))
+            + b'MPF\x00' + tiff)
+    return SimpleUploadedFile(
+        name='camera.jpg', content=first[:2] + app2 + first[2:] + second,
+        content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_large_jpeg_is_downscaled(self):
+        """Картинка больше предела сохраняется уменьшенной."""
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Большое фото', 'image': make_jpeg((400, 200))})
+        post = Post.objects.get(text='Большое фото')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(image.format, 'JPEG')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_camera_mpo_is_accepted(self):
+        """Снимок MPO принимается, уменьшенный сохраняется как JPEG."""
+        with Image.open(make_mpo((400, 200))) as image:
+            self.assertEqual(image.format, 'MPO')
+        for text, size, saved in (('Снимок', (80, 40), (80, 40)),
+                                  ('Большой снимок', (400, 200), (100, 50))):
+            with self.subTest(text=text):
+                self.client.post(reverse('posts:post_create'), data={
+                    'text': text, 'image': make_mpo(size)})
+                post = Post.objects.get(text=text)
+                with Image.open(post.image.path) as image:
+                    self.assertEqual(image.size, saved)
+                    if size != saved:
+                        self.assertEqual(image.format, 'JPEG')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels_rejected(self):
+        """Картинку сверх лимита пикселей форма не принимает."""
+        response = self.client.post(reverse('posts:post_create'), data={
+            'text': 'Огромное фото', 'image': make_jpeg((100, 100))})
+        self.assertFormError(
+            response, 'form', 'image',
+            'В картинке 10 000 пикселей, а можно не больше 1 000.')
+        self.assertFalse(Post.objects.filter(text='Огромное фото').exists())
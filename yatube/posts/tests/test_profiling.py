@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+User = get_user_model()
+
+PROFILE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PROFILE_DIR=PROFILE_DIR, PROFILE_TRIGGER_TOKEN='secret')
+class ProfilingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+
+    def profiles(self, view):
+        directory = os.path.join(PROFILE_DIR, view)
+        return os.listdir(directory) if os.path.isdir(directory) else []
+
+    def test_sampled_requests_are_profiled(self):
+        """При PROFILE_SAMPLE_RATE=1 профиль пишется в каталог view."""
+        with self.settings(PROFILE_SAMPLE_RATE=1):
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(len(self.profiles('posts.index')), 1)
+
+    def test_trigger_header(self):
+        """Заголовок работает только с верным токеном или для сотрудника."""
+        url = reverse('posts:index')
+        self.client.get(url, HTTP_X_PROFILE='wrong')
+        self.assertEqual(self.profiles('posts.index'), [])
+        self.client.get(url, HTTP_X_PROFILE='secret')
+        self.assertEqual(len(self.profiles('posts.index')), 1)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(url, HTTP_X_PROFILE='1')
+        self.assertEqual(len(self.profiles('posts.index')), 2)
+
+    def test_report(self):
+        """profile_report сводит профили представления в один отчёт."""
+        with self.settings(PROFILE_SAMPLE_RATE=1):
+            self.client.get(reverse('posts:index'))
+            self.client.get(reverse('posts:index'))
+        output = StringIO()
+        call_command('profile_report', 'posts:index', '--top', '5',
+                     stdout=output)
+        report = output.getvalue()
+        self.assertIn('== posts:index: запросов 2', report)
+        self.assertIn('function calls', report)
+        self.assertIn('Ordered by: cumulative time', report)
@@ -0,0 +1,87 @@
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.match = Post.objects.create(
+            text='Кошки <b>любят</b> рыбу', author=cls.user)
+        cls.better_match = Post.objects.create(
+            text='кошки кошки кошки', author=cls.user)
+        cls.other = Post.objects.create(text='Собаки', author=cls.user)
+
+    def search(self, query, client=None):
+        response = (client or self.client).get(
+            reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_ranked_results_with_safe_snippets(self):
+        """Результаты ранжированы, сниппет подсвечен и экранирован."""
+        results = self.search('кошки')
+        self.assertEqual([post.id for post in results],
+                         [self.better_match.id, self.match.id])
+        snippet = results[1].snippet_html
+        self.assertIn('<mark>Кошки</mark>', snippet)
+        self.assertIn('&lt;b&gt;', snippet)
+        self.assertEqual(self.search('"кошки*'), results)
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Триггеры держат индекс в актуальном состоянии."""
+        self.other.text = 'Собаки и кошки'
+        self.other.save()
+        self.assertIn(self.other.id,
+                      [post.id for post in self.search('кошки')])
+        self.other.delete()
+        self.assertEqual(self.search('собаки'), [])
+
+    def test_cursor_pages_keep_query(self):
+        """Ссылка на следующую страницу сохраняет поисковый запрос."""
+        for number in range(settings.SAMPLING):
+            Post.objects.create(text=f'кошки {number}', author=self.user)
+        response = self.client.get(reverse('posts:search'), {'q': 'кошки'})
+        page_obj = response.context['page_obj']
+        self.assertContains(
+            response, f'?q={quote("кошки")}&amp;after={page_obj.next_cursor}')
+        response = self.client.get(
+            reverse('posts:search'),
+            {'q': 'кошки', 'after': page_obj.next_cursor})
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_numbered_pages(self):
+        """?page=N считает совпадения без bm25 и snippet."""
+        for number in range(settings.SAMPLING):
+            Post.objects.create(text=f'кошки {number}', author=self.user)
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'кошки', 'page': 1})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, settings.SAMPLING + 2)
+        self.assertEqual(page_obj.paginator.num_pages, 2)
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'кошки', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 2)
+        response = self.client.get(
+            reverse('posts:search'), {'q': '!!!', 'page': 1})
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через полнотекстовый индекс."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get('/admin/posts/post/', {'q': 'рыбу'})
+        self.assertEqual(
+            [post.id for post in response.context['cl'].result_list],
+            [self.match.id])
@@ -0,0 +1,87 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import timing
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+
+def metrics(response):
+    """{метрика: (dur, desc)} из заголовка Server-Timing."""
+    found = {}
+    for part in response['Server-Timing'].split(', '):
+        name = part.split(';')[0]
+        duration = re.search(r'dur=([\d.]+)', part)
+        description = re.search(r'desc="([^"]*)"', part)
+        found[name] = (float(duration.group(1)),
+                       description.group(1) if description else None)
+    return found
+
+
+@override_settings(SERVER_TIMING_HEADER=True)
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='timed')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_header_and_log_line(self):
+        """Заголовок и строка лога с именем представления и SQL."""
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        found = metrics(response)
+        self.assertEqual(
+            set(found), {'db', 'tpl', 'cache', 'thumb', 'total'})
+        queries = int(found['db'][1].split()[0])
+        self.assertGreater(queries, 0)
+        self.assertGreater(found['tpl'][0], 0)
+        self.assertGreaterEqual(found['total'][0], found['tpl'][0])
+        self.assertIn('view=posts:index', logs.output[0])
+        self.assertIn(f'db_queries={queries}', logs.output[0])
+        self.assertEqual(logs.records[0].timing['view'], 'posts:index')
+
+    def test_cache_hits_and_misses(self):
+        """Второй запрос страницы берёт её из кэша."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        first = metrics(self.client.get(url))['cache'][1]
+        second = metrics(self.client.get(url))['cache'][1]
+        self.assertRegex(first, r'hits=\d+ misses=[1-9]')
+        self.assertNotRegex(second, r'hits=0 ')
+
+    def test_thumbnail_time(self):
+        """Нарезка миниатюр внутри запроса попадает в метрику thumb."""
+        timings, token = timing.start()
+        try:
+            thumbnails.generate(0)
+        finally:
+            timing.stop(token)
+        self.assertEqual(timings.counts['thumbnail'], 1)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_only_for_staff(self):
+        """Без SERVER_TIMING_HEADER заголовок получают только сотрудники,
+        лог пишется всегда."""
+        url = reverse('about:author')
+        with self.assertLogs('core.middleware', 'INFO'):
+            response = self.client.get(url)
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.client.force_login(self.user)
+        self.assertFalse(self.client.get(url).has_header('Server-Timing'))
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertTrue(self.client.get(url).has_header('Server-Timing'))
+
+    def test_outside_request_is_noop(self):
+        """Вне запроса замеры ничего не делают."""
+        with timing.timed('db') as outer:
+            self.assertFalse(outer)
@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.views import media
+from posts import blobs, thumbnails
+from posts.models import MediaBlob, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def upload(name):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class HashedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='blob_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_duplicates_share_one_file(self):
+        """Одна картинка в двух постах — один файл и одна ссылка на два."""
+        first = Post.objects.create(
+            text='Первый', author=self.user, image=upload('a.gif'))
+        second = Post.objects.create(
+            text='Второй', author=self.user, image=upload('b.gif'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}'
+                                           r'\.gif$')
+        self.assertEqual(
+            MediaBlob.objects.get(name=first.image.name).refcount, 2)
+
+    def test_last_reference_deletes_file(self):
+        """Файл удаляется вместе с последним постом, который на него
+        ссылается."""
+        first = Post.objects.create(
+            text='Первый', author=self.user, image=upload('a.gif'))
+        second = Post.objects.create(
+            text='Второй', author=self.user, image=upload('b.gif'))
+        path = first.image.path
+        with mock.patch('posts.blobs.transaction.on_commit',
+                        side_effect=lambda callback: callback()):
+            first.delete()
+            self.assertTrue(os.path.exists(path))
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_reupload_before_commit_keeps_file(self):
+        """Картинку загрузили снова, пока удаление последнего поста ещё не
+        закоммичено: файл остаётся."""
+        first = Post.objects.create(
+            text='Первый', author=self.user, image=upload('a.gif'))
+        path = first.image.path
+        with mock.patch('posts.blobs.transaction.on_commit') as on_commit:
+            first.delete()
+        second = Post.objects.create(
+            text='Второй', author=self.user, image=upload('b.gif'))
+        on_commit.call_args[0][0]()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(
+            MediaBlob.objects.get(name=second.image.name).refcount, 1)
+
+    def test_duplicate_reuses_variants(self):
+        """Повторная картинка получает варианты без новой нарезки."""
+        first = Post.objects.create(
+            text='Первый', author=self.user, image=upload('a.gif'))
+        thumbnails.generate(first.pk)
+        second = Post.objects.create(
+            text='Второй', author=self.user, image=upload('b.gif'))
+        with self.settings(POST_IMAGE_WIDTHS=()):
+            # Нарезка с пустым списком ширин упала бы.
+            thumbnails.generate(second.pk)
+        self.assertEqual(
+            sorted(second.variants.values_list('image', flat=True)),
+            sorted(first.variants.values_list('image', flat=True)))
+
+    def test_concurrent_duplicate_upload(self):
+        """Файл, появившийся после проверки exists, не зацикливает _save."""
+        first = Post.objects.create(
+            text='Первый', author=self.user, image=upload('a.gif'))
+        storage = first.image.storage
+        with mock.patch.object(storage, 'exists', return_value=False):
+            name = storage.save('posts/b.gif', upload('b.gif'))
+        self.assertEqual(name, first.image.name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(name)])
+
+    def test_reconcile_many_blobs(self):
+        """reconcile создаёт ссылки больше чем для 500 картинок."""
+        Post.objects.bulk_create(
+            [Post(text='Пост', author=self.user, image=f'posts/{number}.gif')
+             for number in range(600)])
+        blobs.reconcile()
+        self.assertEqual(MediaBlob.objects.filter(refcount=1).count(), 600)
+
+    def test_hashed_media_is_immutable(self):
+        """Файлы с именем по содержимому отдаются с immutable."""
+        post = Post.objects.create(
+            text='Пост', author=self.user, image=upload('a.gif'))
+        request = RequestFactory().get('/media/' + post.image.name)
+        response = media(request, post.image.name)
+        self.assertIn('immutable', response['Cache-Control'])
@@ -0,0 +1,165 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import ImageVariant, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thumb_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=SMALL_GIF,
+                content_type='image/gif'),
+        )
+        self.url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.pk})
+
+    @mock.patch('posts.thumbnails.submit')
+    def test_placeholder_until_ready(self, submit):
+        """Пока вариантов нет, страница показывает заглушку и ставит
+        картинку в очередь; после генерации — <picture>."""
+        response = self.client.get(self.url)
+        self.assertNotContains(response, '<picture>')
+        submit.assert_called_with(self.post.pk)
+        thumbnails.generate(self.post.pk)
+        response = self.client.get(self.url)
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'srcset=')
+        self.assertNotContains(response, 'loading="lazy"')
+
+    def test_variants_not_wider_than_source(self):
+        """Маленькая картинка получает один вариант на каждый формат."""
+        thumbnails.generate(self.post.pk)
+        variants = list(self.post.variants.all())
+        self.assertEqual(len(variants), len(thumbnails.variant_formats()))
+        self.assertEqual(
+            {variant.width for variant in variants},
+            {min(settings.POST_IMAGE_WIDTHS)})
+        self.assertEqual(thumbnails.variant_widths(5000),
+                         sorted(settings.POST_IMAGE_WIDTHS))
+
+    def test_failure_is_not_resubmitted(self):
+        """Неудачная нарезка оставляет отметку: страница больше не ставит
+        картинку в очередь, build_image_variants --failed режет заново."""
+        with mock.patch('posts.thumbnails.cut_variants',
+                        side_effect=OSError), \
+                self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails.submit(self.post.pk)
+        self.assertEqual(
+            [variant.format for variant in self.post.variants.all()],
+            [ImageVariant.FAILED])
+        with mock.patch('posts.thumbnails.submit') as submit:
+            response = self.client.get(self.url)
+        submit.assert_not_called()
+        self.assertNotContains(response, '<picture>')
+        self.assertNotContains(response, 'aspect-ratio')
+        call_command('build_image_variants', stdout=StringIO())
+        self.assertFalse(self.post.variants.exclude(
+            format=ImageVariant.FAILED).exists())
+        call_command('build_image_variants', '--failed', stdout=StringIO())
+        self.assertFalse(self.post.variants.filter(
+            format=ImageVariant.FAILED).exists())
+        self.assertTrue(self.post.variants.exists())
+
+    def test_backfill_command(self):
+        """build_image_variants готовит картинки старых постов."""
+        call_command('build_image_variants', stdout=StringIO())
+        self.assertTrue(self.post.variants.exists())
+
+    @mock.patch('posts.thumbnails.submit')
+    def test_lazy_below_first_card(self, submit):
+        """В ленте лениво грузятся все картинки, кроме первой."""
+        second = Post.objects.create(
+            text='Второй', author=self.user, image=self.post.image.name)
+        thumbnails.generate(self.post.pk)
+        thumbnails.generate(second.pk)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>', count=2)
+        self.assertContains(response, 'loading="lazy"', count=1)
+
+    @mock.patch('posts.thumbnails.submit')
+    def test_create_schedules_after_commit(self, submit):
+        """post_create отдаёт картинку в пул только после коммита."""
+        self.client.force_login(self.user)
+        image = SimpleUploadedFile(
+            name='new.gif', content=SMALL_GIF, content_type='image/gif')
+        with mock.patch('posts.thumbnails.transaction.on_commit') as commit:
+            self.client.post(reverse('posts:post_create'),
+                             data={'text': 'Новый', 'image': image})
+        commit.assert_called_once()
+        commit.call_args[0][0]()
+        submit.assert_called_once_with(Post.objects.get(text='Новый').pk)
+
+    def test_stale_variants_are_not_written(self):
+        """Картинку заменили, пока резали прежнюю: её варианты не пишутся."""
+        cut = thumbnails.cut_variants
+
+        def replace_while_cutting(image):
+            variants = cut(image)
+            Post.objects.filter(pk=self.post.pk).update(image='posts/new.gif')
+            return variants
+
+        with mock.patch('posts.thumbnails.cut_variants',
+                        side_effect=replace_while_cutting):
+            thumbnails.generate(self.post.pk)
+        self.assertFalse(self.post.variants.exists())
+
+    def test_edit_during_work_is_resubmitted(self):
+        """Пост, отданный в очередь во время работы над ним, режется ещё
+        раз после неё."""
+        def edit_once(post_id):
+            if prepare.call_count == 1:
+                thumbnails.submit(post_id)
+
+        with mock.patch('posts.thumbnails.prepare',
+                        side_effect=edit_once) as prepare:
+            thumbnails.submit(self.post.pk)
+        self.assertEqual(prepare.call_count, 2)
+        self.assertNotIn(self.post.pk, thumbnails._pending)
+        self.assertNotIn(self.post.pk, thumbnails._dirty)
+
+    def test_listing_skips_thumbnail_store(self):
+        """Лента берёт готовые варианты и не ходит в хранилище sorl."""
+        thumbnails.generate(self.post.pk)
+        with mock.patch.object(default, 'kvstore') as kvstore:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        kvstore.get.assert_not_called()
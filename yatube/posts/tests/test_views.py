@@ -1,14 +1,23 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from posts.models import Group, Post
+from posts.management.commands import check_query_plans
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import keyset_filter
 
 User = get_user_model()
 
@@ -174,6 +183,11 @@ class PaginatorTests(TestCase):
                 group=cls.group
             )
 
+    def setUp(self):
+        # Страницы для анонимов кэшируются целиком, а данные класса
+        # общие для всех тестов — в кэше нет контекста шаблона.
+        cache.clear()
+
     def test_first_page_contains(self):
         response = self.client.get(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj']),
@@ -214,3 +228,194 @@ class PaginatorTests(TestCase):
         )
         self.assertEqual(len(
             response.context['page_obj']), settings.NUMBER_POST)
+
+    def test_index_cursor_second_page(self):
+        """Курсор ?before= ведёт на следующую страницу без OFFSET."""
+        response = self.client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.has_next())
+        self.assertFalse(page_obj.has_previous())
+        response = self.client.get(
+            reverse('posts:index') + f'?before={page_obj.next_cursor}')
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), settings.NUMBER_POST)
+        self.assertFalse(second_page.has_next())
+        first_ids = {post.id for post in page_obj}
+        self.assertFalse(first_ids & {post.id for post in second_page})
+        response = self.client.get(
+            reverse('posts:index')
+            + f'?after={second_page.previous_cursor}')
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            [post.id for post in page_obj])
+
+    def test_cursor_page_searches_index_range(self):
+        """Страница по курсору ищет диапазон в индексе, а не проходит его.
+
+        Иначе стоимость ?before= росла бы с глубиной, как у OFFSET.
+        """
+        urls = (reverse('posts:index'),
+                reverse('posts:profile', kwargs={'username': 'test_user'}))
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                cursor = response.context['page_obj'].next_cursor
+                queries = []
+
+                def record(execute, sql, params, many, context):
+                    queries.append((sql, params))
+                    return execute(sql, params, many, context)
+
+                with connection.execute_wrapper(record):
+                    self.client.get(f'{url}?before={cursor}')
+                # План строится по запросу с параметрами, как у представления:
+                # по подставленным литералам SQLite выбрал бы другой.
+                sql, params = next(
+                    (sql, params) for sql, params in queries
+                    if 'FROM "posts_post"' in sql and 'ORDER BY' in sql)
+                with connection.cursor() as db_cursor:
+                    db_cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                    plan = '\n'.join(row[-1] for row in db_cursor.fetchall())
+                self.assertRegex(
+                    plan, r'SEARCH posts_post USING .*INDEX .*pub_date<')
+                self.assertNotIn('SCAN posts_post', plan)
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор не ломает страницу."""
+        response = self.client.get(reverse('posts:index') + '?before=zzz')
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.SAMPLING)
+
+    def test_cursor_of_wrong_shape_is_ignored(self):
+        """Курсор с другим числом частей или типами — как без курсора."""
+        follower = User.objects.create_user(username='shape_follower')
+        Follow.objects.create(user=follower, author=self.user)
+        self.client.force_login(follower)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'test_user'}),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=Тестовый&',
+            reverse('posts:comments', kwargs={'post_id': self.post.pk}) + '?',
+            reverse('posts:api_index'),
+        )
+        for url in urls:
+            separator = '' if url.endswith(('?', '&')) else '?'
+            for param in ('before', 'after'):
+                for cursor in ('i5', 'd1_d2', 'i1_i2_i3', 'f1.5_i3'):
+                    with self.subTest(url=url, param=param, cursor=cursor):
+                        cache.clear()
+                        response = self.client.get(
+                            f'{url}{separator}{param}={cursor}')
+                        self.assertEqual(response.status_code, 200)
+
+    def test_page_number_is_capped(self):
+        """?page=N глубже PAGINATOR_MAX_PAGE не уходит."""
+        with self.settings(PAGINATOR_MAX_PAGE=1):
+            response = self.client.get(reverse('posts:index') + '?page=2')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 1)
+        self.assertFalse(page_obj.has_next())
+        self.assertIsNotNone(page_obj.next_cursor)
+
+    def test_listing_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.user)
+        client = Client()
+        client.force_login(follower)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}),
+            reverse('posts:follow_index'),
+        )
+        cache.clear()
+        for url in urls:
+            with self.subTest(url=url):
+                # Первый запрос прогревает кэши (ленту подписок и т.п.).
+                client.get(url)
+                with CaptureQueriesContext(connection) as full_page:
+                    response = client.get(url)
+                cursor = response.context['page_obj'].next_cursor
+                with CaptureQueriesContext(connection) as short_page:
+                    response = client.get(f'{url}?before={cursor}')
+                self.assertEqual(len(response.context['page_obj']),
+                                 settings.NUMBER_POST)
+                self.assertEqual(len(full_page), len(short_page))
+
+    def test_view_queries_use_indexes(self):
+        """Запросы представлений не сканируют таблицы и не сортируют."""
+        output = StringIO()
+        call_command('check_query_plans', stdout=output)
+        self.assertIn('Все запросы используют индексы.', output.getvalue())
+        # Запросы берутся из самих представлений, вместе с ?page=N и COUNT.
+        self.assertIn(' OFFSET ', output.getvalue())
+        self.assertIn('COUNT(*)', output.getvalue())
+
+    def test_index_walk_without_range_is_flagged(self):
+        """Проход индекса без диапазона по курсору — ошибка плана."""
+        now = timezone.now()
+        unbounded = Q(pub_date__lt=now) | Q(pub_date=now, id__lt=1)
+        bounded = keyset_filter(('pub_date', 'id'), (now, 1), 'lt')
+        for condition, flagged in ((unbounded, True), (bounded, False)):
+            with self.subTest(flagged=flagged):
+                posts = Post.objects.filter(condition).order_by(
+                    '-pub_date', '-id')[:settings.NUMBER_POST]
+                sql, params = posts.query.sql_with_params()
+                plan = check_query_plans.explain(sql, params)
+                problems = list(check_query_plans.problems_of(sql, plan))
+                self.assertEqual(bool(problems), flagged, plan)
+
+
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        cls.readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)
+        ]
+        for number in range(settings.COMMENTS_PER_PAGE + 5):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.readers[number % len(cls.readers)],
+                text=f'Комментарий {number}',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_comment_page(self):
+        """post_detail выводит первые комментарии от старых к новым."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'comments-more')
+
+    def test_comments_fragment_continues_by_cursor(self):
+        """Фрагмент ?after= отдаёт оставшиеся комментарии без повторов."""
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        cursor = first.context['comments'].next_cursor
+        url = reverse('posts:comments', kwargs={'post_id': self.post.pk})
+        with CaptureQueriesContext(connection) as rest_page:
+            response = self.client.get(f'{url}?after={cursor}')
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 5)
+        self.assertEqual(comments[0].text,
+                         f'Комментарий {settings.COMMENTS_PER_PAGE}')
+        self.assertFalse(comments.has_next())
+        self.assertNotContains(response, 'comments-more')
+        self.assertNotContains(response, '<html')
+        cache.clear()
+        with CaptureQueriesContext(connection) as first_page:
+            self.client.get(url)
+        self.assertEqual(len(first_page), len(rest_page))
@@ -0,0 +1,172 @@
+"""Варианты картинок постов, которые готовятся вне запроса.
+
+После сохранения поста с новой картинкой пул потоков (schedule) режет её
+в кадр карточки на ширины POST_IMAGE_WIDTHS в JPEG и, если Pillow умеет,
+в WebP, и сохраняет результат в ImageVariant. Шаблоны показывают только
+готовые варианты через <picture>, а пока их нет — заглушку. Картинка,
+которую разрезать не удалось, получает строку-отметку FAILED: шаблоны
+больше не ставят её в очередь, снова её режет build_image_variants
+--failed. При THUMBNAIL_WORKERS = 0 картинки режутся на месте, без пула.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import Image, features
+from sorl.thumbnail import get_thumbnail
+
+from core import timing
+
+from . import generations
+from .models import ImageVariant, Post
+
+logger = logging.getLogger(__name__)
+
+# Пропорции кадра карточки поста: 960x339.
+CARD_RATIO = 339 / 960
+
+_executor = None
+_pending = set()
+# Посты, картинка которых сменилась, пока пул резал прежнюю: их режут
+# ещё раз, когда текущая работа закончится.
+_dirty = set()
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+    return _executor
+
+
+def variant_formats():
+    """Форматы вариантов: WebP только если Pillow собран с его поддержкой."""
+    if features.check('webp'):
+        return (ImageVariant.WEBP, ImageVariant.JPEG)
+    return (ImageVariant.JPEG,)
+
+
+def variant_widths(source_width):
+    """Ширины не больше исходной картинки, но хотя бы одна."""
+    widths = sorted(settings.POST_IMAGE_WIDTHS)
+    return [width for width in widths if width <= source_width] or widths[:1]
+
+
+@timing.timed('thumbnail')
+def generate(post_id):
+    """Создаёт варианты картинки поста вместо прежних."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author', 'group').first()
+    if post is None or not post.image:
+        return
+    # Та же картинка (то же имя в HashedStorage) уже разрезана для другого
+    # поста: копируем строки, файлы вариантов общие.
+    twins = ImageVariant.objects.filter(post__image=post.image.name).exclude(
+        post=post).exclude(format=ImageVariant.FAILED).values(
+        'post').order_by()[:1]
+    variants = [
+        ImageVariant(width=twin.width, height=twin.height,
+                     format=twin.format, image=twin.image.name)
+        for twin in ImageVariant.objects.filter(post__in=twins)
+    ]
+    if not variants:
+        variants = cut_variants(post.image)
+    for variant in variants:
+        variant.post = post
+    with transaction.atomic():
+        # Пока резали, картинку могли заменить: варианты прежней не пишем,
+        # новую нарежет повторная постановка в очередь (см. submit).
+        current = Post.objects.select_for_update().filter(
+            pk=post_id).values_list('image', flat=True).first()
+        if current != post.image.name:
+            return
+        post.variants.all().delete()
+        ImageVariant.objects.bulk_create(variants)
+    # В кэше страниц и фрагментов ещё лежит заглушка.
+    generations.bump(*generations.post_scopes(
+        post.author_id, post.group_id, post_id=post.pk))
+
+
+def cut_variants(image):
+    """Несохранённые ImageVariant картинки по всем ширинам и форматам."""
+    with image.open() as source:
+        source_width = Image.open(source).size[0]
+    variants = []
+    for width in variant_widths(source_width):
+        geometry = f'{width}x{round(width * CARD_RATIO)}'
+        for image_format in variant_formats():
+            thumbnail = get_thumbnail(
+                image, geometry, crop='center', upscale=True,
+                format=image_format)
+            variants.append(ImageVariant(
+                width=thumbnail.width, height=thumbnail.height,
+                format=image_format, image=thumbnail.name))
+    return variants
+
+
+def record_failure(post_id):
+    """Отметка FAILED вместо вариантов картинки поста."""
+    with transaction.atomic():
+        if not Post.objects.filter(pk=post_id).exists():
+            return
+        ImageVariant.objects.filter(post_id=post_id).delete()
+        ImageVariant.objects.create(
+            post_id=post_id, format=ImageVariant.FAILED, width=0, height=0)
+
+
+def prepare(post_id):
+    """generate, который не падает: вернёт False и оставит отметку."""
+    try:
+        generate(post_id)
+        return True
+    except Exception:
+        logger.exception('Не удалось подготовить картинку поста %s', post_id)
+    try:
+        record_failure(post_id)
+    except Exception:
+        logger.exception('Не удалось отметить картинку поста %s', post_id)
+    return False
+
+
+def _work(post_id, in_pool=True):
+    try:
+        prepare(post_id)
+    finally:
+        with _lock:
+            _pending.discard(post_id)
+            again = post_id in _dirty
+            _dirty.discard(post_id)
+        if in_pool:
+            # У потока пула своё соединение с базой.
+            connection.close()
+    if again:
+        submit(post_id)
+
+
+def submit(post_id):
+    """Ставит пост в очередь пула; если он уже в работе — повторит его
+    после неё."""
+    with _lock:
+        if post_id in _pending:
+            _dirty.add(post_id)
+            return
+        _pending.add(post_id)
+    if settings.THUMBNAIL_WORKERS:
+        get_executor().submit(_work, post_id)
+    else:
+        _work(post_id, in_pool=False)
+
+
+def schedule(post):
+    """Картинка поста сменилась: старые варианты долой, новые — после
+    коммита."""
+    post.variants.all().delete()
+    if post.image:
+        post_id = post.pk
+        transaction.on_commit(lambda: submit(post_id))
@@ -0,0 +1,268 @@
+"""Лента подписок в кэше: последние посты для каждого пользователя.
+
+Посты обычных авторов при публикации дописываются в ленты подписчиков
+(push). Посты авторов, у которых подписчиков не меньше
+TIMELINE_CELEBRITY_FOLLOWERS, не раскладываются ни в кэш, ни в FeedEntry:
+они подмешиваются при чтении (pull). Автор, который перестал быть
+«звездой», раскладывается по FeedEntry подписчиков (feed.demote).
+
+Кэш хранит первые TIMELINE_LENGTH записей ленты и собирается из FeedEntry;
+более глубокие страницы, в том числе ?page=N, читаются из Post запросом
+на каждого автора подписок.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import FeedEntry, Follow, Post, Profile
+from .utils import CursorPaginator, keyset_filter, read_cursor
+
+
+def timeline_key(user_id):
+    return f'timeline:{user_id}'
+
+
+def celebrity_key(author_id):
+    return f'timeline:celebrity:{author_id}'
+
+
+def celebrity_flags(author_ids):
+    """{author_id: True/False} — «звезда» ли автор, с кэшем."""
+    keys = {celebrity_key(author_id): author_id for author_id in author_ids}
+    flags = cache.get_many(keys)
+    missing = [keys[key] for key in keys if key not in flags]
+    if missing:
+        followers = dict(Profile.objects.filter(user__in=missing).values_list(
+            'user', 'follower_count'))
+        fresh = {
+            celebrity_key(author_id): (
+                followers.get(author_id, 0)
+                >= settings.TIMELINE_CELEBRITY_FOLLOWERS)
+            for author_id in missing
+        }
+        cache.set_many(fresh, settings.TIMELINE_CELEBRITY_TIMEOUT)
+        flags.update(fresh)
+    return {keys[key]: flag for key, flag in flags.items()}
+
+
+def refresh_celebrity(author_id):
+    """Флаг «звезды» по числу подписчиков сразу после подписки или
+    отписки, не дожидаясь истечения кэша. Вернёт число подписчиков."""
+    followers = Profile.objects.filter(user_id=author_id).values_list(
+        'follower_count', flat=True).first() or 0
+    cache.set(celebrity_key(author_id),
+              followers >= settings.TIMELINE_CELEBRITY_FOLLOWERS,
+              settings.TIMELINE_CELEBRITY_TIMEOUT)
+    return followers
+
+
+def _follower_keys(author_id):
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    batch = []
+    for user_id in follower_ids.iterator():
+        batch.append(timeline_key(user_id))
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def push_post(post):
+    """Дописывает новый пост в уже собранные ленты подписчиков.
+
+    Несобранные ленты не трогаем: они соберутся из FeedEntry при чтении.
+    """
+    if celebrity_flags([post.author_id])[post.author_id]:
+        return
+    entry = (post.pub_date, post.pk)
+    for keys in _follower_keys(post.author_id):
+        timelines = cache.get_many(keys)
+        for key, entries in timelines.items():
+            entries.insert(0, entry)
+            entries.sort(reverse=True)
+            del entries[settings.TIMELINE_LENGTH:]
+        cache.set_many(timelines, settings.TIMELINE_TIMEOUT)
+
+
+def drop_post(post):
+    """Удалённый пост: ленты подписчиков соберутся заново.
+
+    Ленты подписчиков «звёзд» не сбрасываем: пропавший пост просто
+    не попадёт на страницу.
+    """
+    if celebrity_flags([post.author_id])[post.author_id]:
+        return
+    forget_followers(post.author_id)
+
+
+def forget_followers(author_id):
+    """Ленты всех подписчиков автора соберутся заново."""
+    for keys in _follower_keys(author_id):
+        cache.delete_many(keys)
+
+
+def forget(user_id):
+    """Подписки изменились — ленту пользователя нужно собрать заново."""
+    cache.delete(timeline_key(user_id))
+
+
+def author_entries(author_id, cursor=None, descending=True, limit=None):
+    """Посты автора для ленты: (pub_date, id) в порядке ленты.
+
+    С курсором — только посты за ним: более ранние при descending,
+    иначе более поздние.
+    """
+    posts = Post.objects.filter(author_id=author_id)
+    if cursor is not None:
+        posts = posts.filter(keyset_filter(
+            ('pub_date', 'id'), cursor, 'lt' if descending else 'gt'))
+    ordering = ('-pub_date', '-id') if descending else ('pub_date', 'id')
+    return posts.order_by(*ordering).values_list(
+        'pub_date', 'id')[:limit or settings.TIMELINE_LENGTH]
+
+
+def followed_authors(user_id):
+    return list(Follow.objects.filter(user_id=user_id).values_list(
+        'author', flat=True))
+
+
+def followed_celebrities(user_id):
+    flags = celebrity_flags(followed_authors(user_id))
+    return [author_id for author_id, flag in flags.items() if flag]
+
+
+def merge_authors(entries, author_ids, limit, cursor=None, descending=True):
+    """Записи ленты вместе с постами авторов author_ids, не больше limit.
+
+    Второе значение — True, если за последней записью может быть ещё что-то.
+    """
+    # По запросу на автора: каждый — диапазон индекса (author, -pub_date),
+    # а author__in с ORDER BY сортировал бы всё во временном B-дереве.
+    pulled = [list(author_entries(author_id, cursor, descending, limit))
+              for author_id in author_ids]
+    merged = sorted(set(entries).union(*pulled), reverse=descending)
+    more = len(merged) > limit or any(
+        len(posts) >= limit for posts in pulled)
+    return merged[:limit], more
+
+
+def stored_entries(user_id, cursor=None, descending=True, limit=None):
+    """Записи FeedEntry пользователя за курсором: (pub_date, post_id)."""
+    entries = FeedEntry.objects.filter(user_id=user_id)
+    if cursor is not None:
+        entries = entries.filter(keyset_filter(
+            ('pub_date', 'post'), cursor, 'lt' if descending else 'gt'))
+    # post_id, а не post: по связи Django сортировал бы по Post.Meta.ordering
+    # через JOIN, и хвост сортировки шёл бы во временном B-дереве.
+    ordering = (('-pub_date', '-post_id') if descending
+                else ('pub_date', 'post_id'))
+    return list(entries.order_by(*ordering).values_list(
+        'pub_date', 'post_id')[:limit or settings.TIMELINE_LENGTH])
+
+
+def read_timeline(user_id):
+    """Первые записи ленты: (pub_date, post_id) по убыванию и флаг полноты.
+
+    Флаг полноты означает, что за последней записью в ленте ничего нет.
+    """
+    key = timeline_key(user_id)
+    entries = cache.get(key)
+    if entries is None:
+        entries = stored_entries(user_id)
+        cache.set(key, entries, settings.TIMELINE_TIMEOUT)
+    complete = len(entries) < settings.TIMELINE_LENGTH
+    celebrities = followed_celebrities(user_id)
+    if celebrities:
+        entries, more = merge_authors(
+            entries, celebrities, settings.TIMELINE_LENGTH)
+        complete = complete and not more
+    return entries, complete
+
+
+def read_entries(user_id, cursor, descending, limit):
+    """Записи ленты за курсором мимо кэша и FeedEntry.
+
+    FeedEntry знает у каждого автора только посты с момента подписки и
+    последние TIMELINE_LENGTH до неё, поэтому глубже первых записей лента
+    читается из Post: запросом на каждого автора подписок.
+    """
+    entries, _ = merge_authors(
+        [], followed_authors(user_id), limit, cursor, descending)
+    return entries
+
+
+def first_entries(user_id, limit):
+    """Первые limit записей ленты: из кэша, если они в нём помещаются."""
+    if limit <= settings.TIMELINE_LENGTH:
+        entries, complete = read_timeline(user_id)
+        if complete or len(entries) >= limit:
+            return entries[:limit]
+    return read_entries(user_id, None, True, limit)
+
+
+def _posts_of(entries, posts):
+    """Посты записей ленты в том же порядке; удалённые пропускаются."""
+    ids = [post_id for _, post_id in entries]
+    found = {}
+    for item in posts.filter(pk__in=ids):
+        found[item['id'] if isinstance(item, dict) else item.pk] = item
+    return [found[post_id] for post_id in ids if post_id in found]
+
+
+class NumberedFeed:
+    """Лента подписок как последовательность для CappedPaginator (?page=N).
+
+    Paginator берёт из неё только срезы; страница N читает первые
+    N * per_page записей, глубину ограничивает PAGINATOR_MAX_PAGE.
+    """
+
+    ordered = True
+
+    def __init__(self, user, posts=None):
+        self.user = user
+        self.posts = Post.objects.for_feed() if posts is None else posts
+
+    def __getitem__(self, index):
+        entries = first_entries(self.user.pk, index.stop)
+        return _posts_of(entries[index], self.posts)
+
+
+def _cursor(params, name):
+    return read_cursor(params.get(name, ''), (datetime.datetime, int))
+
+
+def get_page(user, params, per_page=None, posts=None):
+    """Курсорная страница ленты подписок (before/after).
+
+    Первые страницы при листании вперёд берутся из кэша, остальные — из
+    Post запросом на автора (read_entries). posts —
+    выборка для элементов страницы, по умолчанию Post.objects.for_feed();
+    API передаёт сюда .values().
+    """
+    per_page = per_page or settings.SAMPLING
+    if posts is None:
+        posts = Post.objects.for_feed()
+    paginator = CursorPaginator(posts, per_page)
+    forward = _cursor(params, paginator.next_param)
+    backward = _cursor(params, paginator.previous_param)
+    if backward is not None and forward is None:
+        window = read_entries(user.pk, backward, False, per_page + 1)
+        has_previous = len(window) > per_page
+        entries = window[:per_page][::-1]
+        has_next = True
+    else:
+        entries, complete = read_timeline(user.pk)
+        if forward is not None:
+            entries = [entry for entry in entries if entry < forward]
+        window = entries[:per_page + 1]
+        if len(window) <= per_page and not complete:
+            window = read_entries(user.pk, forward, True, per_page + 1)
+        has_next = len(window) > per_page
+        entries = window[:per_page]
+        has_previous = forward is not None
+    return paginator.make_page(
+        _posts_of(entries, posts),
+        has_next=has_next, has_previous=has_previous)
@@ -0,0 +1,76 @@
+"""Проверка и уменьшение загружаемых картинок с ограниченной памятью.
+
+Загрузка пишется во временный файл (TemporaryFileUploadHandler), форма
+читает у картинки только заголовок: формат и размеры. Слишком большие
+картинки уменьшаются до POST_IMAGE_MAX_SIDE; JPEG при этом декодируется
+сразу в уменьшенном масштабе через draft(), так что полный растр
+в памяти не появляется.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from PIL import Image
+
+# MPO — JPEG с дополнительными кадрами, так Pillow видит многие снимки
+# телефонов и камер.
+ALLOWED_FORMATS = ('JPEG', 'MPO', 'PNG', 'GIF', 'WEBP')
+# Форматы, которые уменьшаем; анимированный GIF кадр за кадром не режем.
+DOWNSCALE_FORMATS = ('JPEG', 'MPO', 'PNG', 'WEBP')
+# В чём сохранять уменьшенную картинку: от MPO остаётся первый кадр.
+SAVE_FORMATS = {'MPO': 'JPEG'}
+
+
+def group_digits(number):
+    """40000000 -> '40 000 000'."""
+    return f'{number:,}'.replace(',', ' ')
+
+
+def validate_image(upload):
+    """Проверяет размер файла, формат и число пикселей по заголовку.
+
+    upload.image — объект Pillow, который forms.ImageField открыл только
+    для чтения заголовка.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.', code='file_too_large',
+            params={'limit': settings.POST_IMAGE_MAX_SIZE // 2 ** 20})
+    image = upload.image
+    if image.format not in ALLOWED_FORMATS:
+        raise ValidationError(
+            'Поддерживаются картинки JPEG, PNG, GIF и WebP.',
+            code='invalid_format')
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'В картинке %(pixels)s пикселей, а можно не больше %(limit)s.',
+            code='too_many_pixels',
+            params={'pixels': group_digits(width * height),
+                    'limit': group_digits(settings.POST_IMAGE_MAX_PIXELS)})
+
+
+def downscale(upload):
+    """Уменьшает загрузку на месте, если она больше POST_IMAGE_MAX_SIDE.
+
+    Уменьшенный растр записывается в тот же временный файл, так что копий
+    загрузки не появляется и Django сам уберёт файл после запроса.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    if (max(upload.image.size) <= max_side
+            or upload.image.format not in DOWNSCALE_FORMATS):
+        return upload
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image_format = SAVE_FORMATS.get(image.format, image.format)
+        exif = image.info.get('exif', b'')
+        if image_format == 'JPEG':
+            # Декодер JPEG сам уменьшает в 2, 4 или 8 раз при чтении.
+            image.draft('RGB', (max_side, max_side))
+        # thumbnail() читает растр целиком, дальше исходный файл не нужен.
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        upload.seek(0)
+        upload.truncate()
+        image.save(upload.file, format=image_format, exif=exif,
+                   **({'quality': 90} if image_format != 'PNG' else {}))
+    upload.size = upload.tell()
+    upload.seek(0)
+    return upload
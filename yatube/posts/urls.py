@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, feeds, views
 
 app_name: str = 'posts'
 
@@ -8,7 +8,9 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('search/', views.search, name='search'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.comments, name='comments'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -26,4 +28,19 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('rss/', feeds.index, {'kind': 'rss'}, name='rss'),
+    path('atom/', feeds.index, {'kind': 'atom'}, name='atom'),
+    path('group/<slug:slug>/rss/', feeds.group_posts, {'kind': 'rss'},
+         name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.group_posts, {'kind': 'atom'},
+         name='group_atom'),
+    path('profile/<str:username>/rss/', feeds.profile, {'kind': 'rss'},
+         name='profile_rss'),
+    path('profile/<str:username>/atom/', feeds.profile, {'kind': 'atom'},
+         name='profile_atom'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post_detail'),
 ]
@@ -1,10 +1,244 @@
-from django.core.paginator import Paginator
+import datetime
 
-from yatube.settings import SAMPLING
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Page, Paginator
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 
+# Порядок ленты: новые посты сверху, id разводит посты с одинаковой датой.
+FEED_ORDERING = ('-pub_date', '-id')
 
-def get_paginator(posts, request):
-    paginator = Paginator(posts, SAMPLING)
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(values):
+    """Кодирует значения ключа сортировки в строку для ссылки."""
+    parts = []
+    for value in values:
+        if isinstance(value, datetime.datetime):
+            # Дата хранится целым числом микросекунд, чтобы не терять точность.
+            parts.append('d{}'.format((value - EPOCH) // datetime.timedelta(
+                microseconds=1)))
+        elif isinstance(value, float):
+            parts.append('f{!r}'.format(value))
+        else:
+            parts.append('i{}'.format(int(value)))
+    return '_'.join(parts)
+
+
+def decode_cursor(cursor):
+    """Обратное к encode_cursor; для испорченного курсора вернёт None."""
+    values = []
+    try:
+        for part in cursor.split('_'):
+            kind, raw = part[0], part[1:]
+            if kind == 'd':
+                values.append(
+                    EPOCH + datetime.timedelta(microseconds=int(raw)))
+            elif kind == 'f':
+                values.append(float(raw))
+            elif kind == 'i':
+                values.append(int(raw))
+            else:
+                return None
+    except (IndexError, ValueError, OverflowError):
+        return None
+    return tuple(values)
+
+
+def read_cursor(cursor, types):
+    """decode_cursor, но только для курсора нужной формы.
+
+    types — тип (или кортеж типов) значения для каждого поля сортировки.
+    Курсор с другим числом частей или другими типами значений считается
+    испорченным: вернётся None.
+    """
+    values = decode_cursor(cursor)
+    if values is None or len(values) != len(types):
+        return None
+    if not all(isinstance(value, kind)
+               for value, kind in zip(values, types)):
+        return None
+    return values
+
+
+def cursor_types(model, fields):
+    """Типы значений курсора для полей сортировки модели."""
+    types = []
+    for name in fields:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Аннотация, например rank поиска.
+            types.append((int, float))
+            continue
+        if isinstance(field, models.DateTimeField):
+            types.append(datetime.datetime)
+        elif isinstance(field, (models.FloatField, models.DecimalField)):
+            types.append((int, float))
+        else:
+            types.append(int)
+    return tuple(types)
+
+
+def keyset_filter(fields, values, lookup):
+    """Условие «ключ (fields) строго больше/меньше values» по порядку полей.
+
+    Дизъюнкция дополнена нестрогой границей по первому полю: без неё SQLite
+    проходит индекс от начала (SCAN ... USING INDEX), и стоимость страницы
+    растёт с глубиной, а с ней ищет диапазон (SEARCH ... USING INDEX).
+    """
+    condition = Q()
+    for position, name in enumerate(fields):
+        equal = dict(zip(fields[:position], values[:position]))
+        equal[f'{name}__{lookup}'] = values[position]
+        condition |= Q(**equal)
+    if len(fields) > 1:
+        condition &= Q(**{f'{fields[0]}__{lookup}e': values[0]})
+    return condition
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу сортировки без COUNT(*) и OFFSET.
+
+    Каждая страница — это один запрос вида WHERE ключ < курсор LIMIT n + 1,
+    поэтому глубина страницы на стоимость не влияет. Номер страницы условный:
+    1 для первой и 2 для любой другой, чтобы has_next/has_previous у Page
+    работали как обычно.
+    """
+
+    cursor_mode = True
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        super().__init__(object_list, per_page)
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+        descending = ordering[0].startswith('-')
+        # before/after относятся к значениям ключа: для ленты «новые сверху»
+        # следующая страница — это посты раньше курсора.
+        if descending:
+            self.next_param, self.previous_param = 'before', 'after'
+        else:
+            self.next_param, self.previous_param = 'after', 'before'
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def get_key(self, item):
+        if isinstance(item, dict):
+            return tuple(item[name] for name in self.fields)
+        return tuple(getattr(item, name) for name in self.fields)
+
+    def get_cursor_page(self, params):
+        """Страница для GET-параметров запроса (before/after)."""
+        types = cursor_types(self.object_list.model, self.fields)
+        forward = read_cursor(params.get(self.next_param, ''), types)
+        backward = read_cursor(params.get(self.previous_param, ''), types)
+        descending = self.ordering[0].startswith('-')
+        if backward is not None and forward is None:
+            reverse = [name[1:] if name.startswith('-') else f'-{name}'
+                       for name in self.ordering]
+            lookup = 'gt' if descending else 'lt'
+            rows = list(self.object_list.filter(
+                keyset_filter(self.fields, backward, lookup)
+            ).order_by(*reverse)[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            items = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.object_list.order_by(*self.ordering)
+            if forward is not None:
+                lookup = 'lt' if descending else 'gt'
+                queryset = queryset.filter(
+                    keyset_filter(self.fields, forward, lookup))
+            rows = list(queryset[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            items = rows[:self.per_page]
+            has_previous = forward is not None
+        return self.make_page(items, has_next, has_previous)
+
+    def make_page(self, items, has_next, has_previous):
+        """Page из уже выбранных строк, с курсорами соседних страниц."""
+        number = 2 if has_previous else 1
+        self._num_pages = number + 1 if has_next else number
+        page = Page(items, number, self)
+        page.next_cursor = (
+            encode_cursor(self.get_key(items[-1]))
+            if has_next and items else None)
+        page.previous_cursor = (
+            encode_cursor(self.get_key(items[0]))
+            if has_previous and items else None)
+        return page
+
+
+class CappedPaginator(Paginator):
+    """Старые ссылки ?page=N с ограничением глубины OFFSET.
+
+    Дальше PAGINATOR_MAX_PAGE страниц вывод продолжается курсором.
+    Число строк берётся из count_func (кэшированные счётчики posts.counts),
+    а если его нет — обычным COUNT(*).
+    """
+
+    cursor_mode = False
+    next_param = 'before'
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING,
+                 max_page=None, count_func=None):
+        super().__init__(object_list, per_page)
+        self.ordering = ordering
+        self.max_page = max_page or settings.PAGINATOR_MAX_PAGE
+        self.count_func = count_func
+
+    @cached_property
+    def count(self):
+        if self.count_func is not None:
+            return self.count_func()
+        return super().count
+
+    @property
+    def num_pages(self):
+        return min(super().num_pages, self.max_page)
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        page.next_cursor = None
+        page.previous_cursor = None
+        deeper = self.count > self.max_page * self.per_page
+        if deeper and page.number == self.max_page and len(page):
+            item = page.object_list[len(page) - 1]
+            page.next_cursor = encode_cursor(
+                tuple(getattr(item, name.lstrip('-'))
+                      for name in self.ordering))
+        return page
+
+
+def get_paginator(posts, request, ordering=FEED_ORDERING, count=None):
+    """Страница списка постов по параметрам запроса.
+
+    ?page=N обслуживает CappedPaginator, всё остальное — CursorPaginator.
+    count — функция без аргументов, возвращающая число строк в posts.
+    """
+    posts = posts.order_by(*ordering)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        paginator = CappedPaginator(
+            posts, settings.SAMPLING, ordering, count_func=count)
+        page = paginator.get_page(page_number)
+    else:
+        paginator = CursorPaginator(posts, settings.SAMPLING, ordering)
+        page = paginator.get_cursor_page(request.GET)
+    page.query_prefix = query_prefix(request)
+    return page
+
+
+def query_prefix(request):
+    """Прочие GET-параметры (например, q поиска) для ссылок постранички."""
+    params = request.GET.copy()
+    for name in ('page', 'before', 'after'):
+        params.pop(name, None)
+    return params.urlencode() + '&' if params else ''
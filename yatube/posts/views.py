@@ -1,64 +1,140 @@
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.decorators import cache_anonymous
+
+from . import counts, generations, stats, thumbnails, timeline
+from .conditional import (conditional, follow_state, group_state,
+                          index_state, page_version, post_state,
+                          profile_state)
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post, User
-from .utils import get_paginator
+from .search import (SEARCH_ORDERING, count_matches, highlight,
+                     search_posts)
+from .utils import (CappedPaginator, CursorPaginator, get_paginator,
+                    query_prefix)
+
+
+# Комментарии идут от старых к новым; id разводит одинаковое время.
+COMMENT_ORDERING = ('created', 'id')
+
 
+def comment_page(post_id, params):
+    """Страница комментариев по курсору ?after=, авторы одним JOIN."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('text', 'created', 'post', 'author__username')
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_PER_PAGE, COMMENT_ORDERING)
+    return paginator.get_cursor_page(params)
 
+
+@conditional(index_state)
+@cache_anonymous(page_version(index_state))
 def index(request):
-    posts = Post.objects.all()
+    # Поколение читаем до выборки постов: пост, сохранённый между ними,
+    # не попадёт в кэш под новым поколением в устаревшем виде.
+    generation = generations.get(generations.ALL)
+    posts = Post.objects.for_feed()
     template = 'posts/index.html'
-    page_obj = get_paginator(posts, request)
+    page_obj = get_paginator(posts, request, count=partial(
+        counts.get_count, counts.ALL_KEY, Post.objects.all()))
     context = {
         'page_obj': page_obj,
+        'generation': generation,
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@conditional(group_state)
+@cache_anonymous(page_version(group_state))
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     template = 'posts/group_list.html'
-    page_obj = get_paginator(group.posts.all(), request)
+    generation = generations.get(generations.group_scope(group.pk))
+    posts = group.posts.for_feed()
+    page_obj = get_paginator(posts, request, count=partial(
+        counts.get_count, counts.group_key(group.pk), group.posts.all()))
     context = {
         'group': group,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'generation': generation,
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@conditional(profile_state)
+@cache_anonymous(page_version(profile_state))
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     template = 'posts/profile.html'
-    page_obj = get_paginator(author.posts.all(), request)
+    generation = generations.get(
+        generations.author_scope(author.pk), generations.GROUPS)
+    posts = author.posts.for_feed()
+    page_obj = get_paginator(posts, request, count=partial(
+        counts.get_count, counts.author_key(author.pk), author.posts.all()))
     following = (
         request.user.is_authenticated
         and Follow.objects.filter(
             user__username=request.user, author__username=username).exists())
     context = {
         'author': author,
+        'author_stats': stats.get_profile(author.pk),
         'following': following,
         'page_obj': page_obj,
+        'generation': generation,
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+def search(request):
+    """Полнотекстовый поиск по постам, лучшие совпадения сверху."""
+    query = request.GET.get('q', '').strip()
+    page_obj = get_paginator(
+        search_posts(query), request, ordering=SEARCH_ORDERING,
+        count=lambda: count_matches(query))
+    for post in page_obj:
+        post.snippet_html = (
+            highlight(post.snippet) if post.snippet else post.text)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@conditional(post_state)
+@cache_anonymous(page_version(post_state))
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    author_posts = post.author.posts.count()
-    num_author_posts = Post.objects.filter(author=author_posts).count()
+    post = get_object_or_404(Post.objects.select_related('author', 'group'),
+                             id=post_id)
+    author_posts = stats.get_profile(post.author_id).post_count
     comment_form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
     context = {
         'post': post,
         'author_posts': author_posts,
-        'posts_count': num_author_posts,
         'form': comment_form,
-        'comments': comments,
+        'comments': comment_page(post.pk, {}),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional(post_state)
+@cache_anonymous(page_version(post_state))
+def comments(request, post_id):
+    """Следующая страница комментариев поста — фрагмент для post_detail."""
+    context = {
+        'post': get_object_or_404(Post.objects.only('pk'), pk=post_id),
+        'comments': comment_page(post_id, request.GET),
+    }
+    return render(request, 'includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     tamplate = 'posts/create_post.html'
@@ -67,6 +143,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('posts:profile', username=request.user.username)
     return render(request, tamplate, {'form': form})
 
@@ -82,6 +159,8 @@ def post_edit(request, post_id):
                     instance=post)
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id=post.pk)
     context = {
         'form': form,
@@ -104,11 +183,19 @@ def add_comment(request, post_id):
 
 
 @login_required
+@conditional(follow_state)
 def follow_index(request):
     """Посты авторов,на которых подписан текущий пользователь, не более 10"""
     user = request.user
-    posts = Post.objects.filter(author__following__user=user)
-    page_obj = get_paginator(posts, request)
+    if 'page' in request.GET:
+        # Старые ссылки ?page=N: те же записи, что и в курсорном режиме.
+        paginator = CappedPaginator(
+            timeline.NumberedFeed(user), settings.SAMPLING,
+            count_func=partial(counts.get_feed_count, user))
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_obj.query_prefix = query_prefix(request)
+    else:
+        page_obj = timeline.get_page(user, request.GET)
     template = 'posts/follow.html'
     context = {
         'page_obj': page_obj,
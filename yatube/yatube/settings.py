@@ -51,22 +51,29 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первой, чтобы total охватывал остальные middleware.
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # После аутентификации: заголовок-триггер принимается от сотрудников.
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с временем рендеринга в Server-Timing
+        'BACKEND': 'core.timing.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -144,8 +151,82 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+CACHES = {
+    'default': {
+        # LocMemCache с попаданиями и промахами в Server-Timing; другой
+        # бэкенд нужно так же обернуть в core.timing.TimingCacheMixin,
+        # иначе метрики кэша будут нулевыми
+        'BACKEND': 'core.cache.TimedLocMemCache',
+    }
+}
+# Поколения (posts.generations), счётчики постов и ленты подписок
+# сбрасываются через кэш. LocMemCache у каждого процесса свой: сохранение,
+# обработанное одним процессом, не сбрасывает копии в других. Поэтому с
+# локальным кэшем всё, что живёт до сброса, хранится не дольше
+# LOCAL_CACHE_TIMEOUT секунд. Для нескольких процессов нужен общий бэкенд
+# (memcached, Redis), и тогда действуют длинные сроки ниже.
+LOCAL_CACHE = CACHES['default']['BACKEND'].endswith('LocMemCache')
+LOCAL_CACHE_TIMEOUT = 20
+
 # кол-во постов
 SAMPLING = 10
+# глубже этой страницы ?page=N не листается, дальше — курсор ?before=
+PAGINATOR_MAX_PAGE = 50
+# сколько живут счётчики постов в кэше (команда recount_posts обновляет их)
+POST_COUNT_TIMEOUT = LOCAL_CACHE_TIMEOUT if LOCAL_CACHE else 60 * 60 * 6
+# размер пачки при раскладке постов по лентам подписчиков
+FEED_BATCH_SIZE = 500
+# лента подписок в кэше: сколько последних постов хранить на пользователя
+TIMELINE_LENGTH = 200
+TIMELINE_TIMEOUT = LOCAL_CACHE_TIMEOUT if LOCAL_CACHE else 60 * 60 * 24
+# с этого числа подписчиков посты автора не раскладываются по лентам,
+# а подмешиваются при чтении; сколько помнить, «звезда» ли автор
+TIMELINE_CELEBRITY_FOLLOWERS = 1000
+TIMELINE_CELEBRITY_TIMEOUT = LOCAL_CACHE_TIMEOUT if LOCAL_CACHE else 60 * 60
+# фрагменты списков постов в кэше; устаревают со сменой поколения
+FRAGMENT_CACHE_TIMEOUT = LOCAL_CACHE_TIMEOUT if LOCAL_CACHE else 60 * 60 * 6
+# страницы для анонимных посетителей: сколько хранить у себя
+# и сколько разрешать хранить браузерам и прокси
+PAGE_CACHE_TIMEOUT = LOCAL_CACHE_TIMEOUT if LOCAL_CACHE else 60 * 60
+PAGE_CACHE_MAX_AGE = 60
+# потоки, которые готовят миниатюры картинок после сохранения поста;
+# 0 — резать в том же потоке (тесты: базу SQLite в памяти пул не разделит)
+THUMBNAIL_WORKERS = 2
+# ширины вариантов картинки поста для srcset
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+# загрузки картинок: целиком на диск, а не в память процесса
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# пределы для картинки поста: размер файла, число пикселей
+# и длинная сторона, до которой уменьшается оригинал
+POST_IMAGE_MAX_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+POST_IMAGE_MAX_SIDE = 2560
+# комментариев на странице поста и в каждой подгрузке
+COMMENTS_PER_PAGE = 20
+# строк на странице JSON API
+API_PAGE_SIZE = 20
+# постов в RSS/Atom-ленте, строк на одну выборку и max-age ответа
+FEED_ITEMS = 50
+FEED_CHUNK_SIZE = 25
+FEED_MAX_AGE = 5 * 60
+# отдавать ли сводку замеров запроса в заголовке Server-Timing всем;
+# сотрудники (is_staff) получают его всегда, строка лога core.middleware
+# пишется всегда. Заголовок раскрывает число запросов и время кэша, поэтому
+# включать его для всех стоит только на стенде.
+SERVER_TIMING_HEADER = False
+# доля запросов, которые профилирует cProfile (0 — только по заголовку)
+PROFILE_SAMPLE_RATE = 0.0
+# заголовок, включающий профилирование запроса для сотрудника или при
+# совпадении значения с PROFILE_TRIGGER_TOKEN
+PROFILE_TRIGGER_HEADER = 'X-Profile'
+PROFILE_TRIGGER_TOKEN = None
+# каталог .pstats, по подкаталогу на представление
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+# время жизни готовой карточки поста в кэше (posts.cards); ключ включает
+# версию карточки, поэтому срок не зависит от сброса и общего кэша
+CARD_CACHE_TIMEOUT = 24 * 60 * 60
 # первые пятнадцать символов поста
 SYMBOLS_POST: int = 15
 # должно быть ... постов
@@ -155,9 +236,3 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}